@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor de detección.
+
+Compara el is_vulnerable original (html.unescape + BeautifulSoup + find_all por
+etiqueta, copiado abajo como referencia) con el motor actual de htin2.py sobre
+páginas sintéticas grandes.
+
+Uso: python3 benchmarks/bench_detection.py [--sizes 100 1000 5000] [--json]
+"""
+
+import os
+import re
+import sys
+import json
+import html
+import time
+import argparse
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import htin2  # noqa: E402
+
+
+def legacy_is_vulnerable(original_response, injected_response, marker=None):
+    """Implementación de is_vulnerable de la v1.1 (referencia)."""
+    raw = injected_response or ''
+    unescaped = html.unescape(raw)
+
+    if marker:
+        if marker in raw or marker in unescaped:
+            return True, 'Payload reflejado (raw/unescaped) con marcador'
+
+    try:
+        soup = BeautifulSoup(unescaped, 'html.parser')
+        dangerous_tags = ['script', 'iframe', 'img', 'svg', 'object', 'embed']
+        for tag in dangerous_tags:
+            elems = soup.find_all(tag)
+            if elems:
+                for e in elems:
+                    if marker and marker in str(e):
+                        return True, f"Etiqueta <{tag}> inyectada detectada en DOM con marcador"
+                return True, f"Etiqueta <{tag}> inyectada detectada en DOM"
+    except Exception:
+        pass
+
+    try:
+        if marker:
+            pattern = re.escape(marker)
+            if len(pattern) > 4 and re.search(pattern, unescaped, re.IGNORECASE):
+                return True, 'Marcador detectado via regex'
+    except Exception:
+        pass
+
+    return False, 'No vulnerable'
+
+
+def synthetic_page(size_kb, marker=None, with_tags=False):
+    """Página de ~size_kb KB con texto, enlaces y entidades; opcionalmente con
+    el marcador reflejado al final y/o etiquetas 'peligrosas' legítimas."""
+    row = ('<tr><td class="c">Lorem ipsum &amp; dolor</td>'
+           '<td><a href="/item?id=1&amp;x=2">enlace</a></td><td>&#39;sit&#39; amet</td></tr>\n')
+    rows = max(1, size_kb * 1024 // len(row))
+    parts = ['<html><head><title>bench</title></head><body><table>']
+    parts.extend(row for _ in range(rows))
+    parts.append('</table>')
+    if with_tags:
+        parts.append('<img src="/logo.png" alt="logo">')
+    if marker:
+        parts.append(f'<div><b>{marker}</b></div>')
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def timeit(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de is_vulnerable')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 5000],
+                        help='Tamaños de página en KB (default: 100 1000 5000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones (se toma el mejor tiempo)')
+    parser.add_argument('--json', action='store_true', help='Salida JSON')
+    args = parser.parse_args()
+
+    scanner = htin2.HTMLInjectionScanner()
+    marker = '__htin_abc123__'
+    scenarios = [
+        ('sin reflejo', None, False),
+        ('reflejado al final', marker, False),
+        ('sin reflejo + <img>', None, True),
+    ]
+
+    results = []
+    for size in args.sizes:
+        for name, reflected, with_tags in scenarios:
+            page = synthetic_page(size, reflected, with_tags)
+            body = page.encode('utf-8')
+
+            legacy = legacy_is_vulnerable('', page, marker)
+            current = scanner.is_vulnerable('', body, marker)
+            assert legacy[0] == current[0], (name, legacy, current)
+
+            t_legacy = timeit(lambda: legacy_is_vulnerable('', page, marker), args.repeat)
+            t_current = timeit(lambda: scanner.analyze(body, marker), args.repeat)
+            results.append({
+                'size_kb': size,
+                'scenario': name,
+                'verdict': current[0],
+                'legacy_ms': round(t_legacy * 1000, 3),
+                'current_ms': round(t_current * 1000, 3),
+                'speedup': round(t_legacy / t_current, 1) if t_current else None,
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return
+
+    print(f"{'KB':>6}  {'escenario':<22} {'legacy ms':>10} {'actual ms':>10} {'x':>8}")
+    for r in results:
+        print(f"{r['size_kb']:>6}  {r['scenario']:<22} {r['legacy_ms']:>10.2f} {r['current_ms']:>10.3f} {r['speedup']:>8}")
+
+
+if __name__ == '__main__':
+    main()
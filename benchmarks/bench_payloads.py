@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor de payloads.
+
+Genera corpus sintéticos de distintos tamaños y mide:
+  - la carga y compilación del corpus (PayloadSet con todas las codificaciones);
+  - el coste por petición de construir la URL inyectada: el camino anterior
+    (template.format + urlencode de toda la query) frente al compilado
+    (Payload.quoted + QueryTemplate.render).
+
+Uso: python3 benchmarks/bench_payloads.py [--sizes 100 1000 10000] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+from urllib.parse import urlencode, urlsplit, urlunsplit, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import htin2  # noqa: E402
+
+URL = 'http://example.com/search?q=test&page=2&sort=desc&lang=es&filter=a&filter=b'
+TAGS = ('b', 'i', 'u', 'div', 'span', 'h1', 'marquee', 'details', 'svg', 'img')
+
+
+def synthetic_corpus(size):
+    """`size` plantillas, la mitad repetidas (los corpus reales traen muchos duplicados)."""
+    lines = []
+    for i in range(size):
+        n = i % max(1, size // 2)
+        tag = TAGS[n % len(TAGS)]
+        lines.append(f'<{tag} data-n="{n}" title=\'x\'>{{marker}}</{tag}>')
+    return lines
+
+
+def legacy_url(url, param, template, marker):
+    payload = template.format(marker=marker)
+    qs = parse_qs(urlsplit(url).query)
+    qs[param] = [payload]
+    parsed = urlsplit(url)
+    return urlunsplit((parsed.scheme, parsed.netloc, parsed.path, urlencode(qs, doseq=True), parsed.fragment))
+
+
+def best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del motor de payloads')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 10000],
+                        help='Plantillas por corpus (default: 100 1000 10000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones (se toma el mejor tiempo)')
+    parser.add_argument('--json', action='store_true', help='Salida JSON')
+    args = parser.parse_args()
+
+    marker = '__htin_abc123__'
+    query = htin2.QueryTemplate(URL, parse_qs(urlsplit(URL).query))
+    results = []
+
+    for size in args.sizes:
+        corpus = synthetic_corpus(size)
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as f:
+            f.write('\n'.join(corpus))
+            path = f.name
+        try:
+            def load():
+                htin2.PayloadSet._files.clear()
+                payload_set = htin2.PayloadSet(encodings=sorted(htin2.PAYLOAD_ENCODINGS))
+                payload_set.load(path)
+                return payload_set
+
+            t_load = best_of(load, args.repeat)
+            payload_set = load()
+            payloads = [payload for _, payload in payload_set.iter(['custom'])]
+            raw = [p for p in payloads if p.encoding == 'raw']
+
+            for p in raw[:50]:
+                assert legacy_url(URL, 'q', p.template, marker) == query.render({'q': p.quoted(marker)})
+
+            t_legacy = best_of(lambda: [legacy_url(URL, 'q', p.template, marker) for p in raw], args.repeat)
+            t_compiled = best_of(lambda: [query.render({'q': p.quoted(marker)}) for p in raw], args.repeat)
+        finally:
+            os.unlink(path)
+
+        results.append({
+            'templates': size,
+            'payloads': len(payloads),
+            'load_ms': round(t_load * 1000, 2),
+            'legacy_us_per_request': round(t_legacy / len(raw) * 1e6, 2),
+            'compiled_us_per_request': round(t_compiled / len(raw) * 1e6, 2),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'plantillas':>10} {'payloads':>9} {'carga ms':>9} {'legacy µs':>10} {'compilado µs':>13}")
+    for r in results:
+        print(f"{r['templates']:>10} {r['payloads']:>9} {r['load_ms']:>9.2f} "
+              f"{r['legacy_us_per_request']:>10.2f} {r['compiled_us_per_request']:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Benchmark de escaneo completo contra el servidor local de testserver.py.
+
+Para cada escenario arranca el servidor, ejecuta scan_url sobre / (con unos
+parámetros en la query) y mide:
+  - peticiones atendidas por el servidor, tiempo total y peticiones/segundo;
+  - memoria máxima (tracemalloc, en una segunda pasada para no distorsionar
+    el tiempo; --no-memory la omite);
+  - precision/recall de los hallazgos frente a las entradas realmente
+    vulnerables (las de tipo r, a y q, ver testserver.py).
+
+--min-recall R termina con código 1 si algún escenario queda por debajo: sirve
+de comprobación de regresiones (p.ej. --scenarios quotes --adaptive --min-recall 1).
+
+--payloads N escanea con un corpus sintético de N plantillas (nivel custom)
+para ver cómo crecen tiempo y memoria con el número de tests.
+
+La salida JSON (--json o --out FILE) sirve para comparar versiones.
+
+Uso: python3 benchmarks/bench_scan.py [--scenarios base wide] [-c 8] [--adaptive] [--payloads 5000] [--json] [--out FILE]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import argparse
+import tracemalloc
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import htin2  # noqa: E402
+from testserver import ServerConfig, start_server  # noqa: E402
+
+SCENARIOS = {
+    'base': ServerConfig(forms=5, width=4, pattern='rnne'),
+    'wide': ServerConfig(forms=2, width=30, pattern='rnnnnnnnea'),
+    'large': ServerConfig(forms=3, width=4, pattern='rnne', page_kb=500),
+    'latency': ServerConfig(forms=3, width=4, pattern='rnne', latency_ms=20),
+    # entradas que escapan solo las comillas: --adaptive no debe descartarlas
+    'quotes': ServerConfig(forms=2, width=4, pattern='qnea'),
+}
+QUERY_PARAMS = ('r_q', 'a_q', 'e_q', 'n_q')
+TAGS = ('b', 'i', 'u', 'div', 'span', 'h1', 'marquee', 'details', 'svg', 'img')
+
+
+def write_corpus(size):
+    """Fichero temporal con `size` plantillas distintas para --payload-file."""
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as f:
+        for n in range(size):
+            tag = TAGS[n % len(TAGS)]
+            f.write(f'<{tag} data-n="{n}">{{marker}}</{tag}>\n')
+        return f.name
+
+
+def run_scan(url, scanner_kwargs, levels):
+    scanner = htin2.make_scanner(**scanner_kwargs)
+    # los logs del scanner no forman parte de la medida
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        findings = scanner.scan_url(url, payload_levels=levels)
+        elapsed = time.perf_counter() - start
+    scanner.session.close()
+    return findings, elapsed, scanner.stats
+
+
+def score(findings, truth):
+    detected = {f.get('field') or f.get('parameter') for f in findings}
+    tp = len(detected & truth)
+    return {
+        'true_positives': tp,
+        'false_positives': len(detected - truth),
+        'false_negatives': len(truth - detected),
+        'precision': round(tp / len(detected), 4) if detected else 1.0,
+        'recall': round(tp / len(truth), 4) if truth else 1.0,
+    }
+
+
+def bench_scenario(name, config, scanner_kwargs, levels, memory=True):
+    server = start_server(config)
+    try:
+        url = f"{server.base_url}/?{'&'.join(p + '=1' for p in QUERY_PARAMS)}"
+        findings, elapsed, stats = run_scan(url, scanner_kwargs, levels)
+        requests_served = server.requests_served
+
+        peak = None
+        if memory:
+            tracemalloc.start()
+            run_scan(url, scanner_kwargs, levels)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        result = {
+            'scenario': name,
+            'server': config.as_dict(),
+            'requests': requests_served,
+            'tests': stats['total_tested'],
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(requests_served / elapsed, 1) if elapsed else None,
+            'peak_memory_mb': round(peak / (1024 * 1024), 2) if peak is not None else None,
+            'findings': len(findings),
+        }
+        result.update(score(findings, server.vulnerable_inputs(QUERY_PARAMS)))
+        return result
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de escaneo contra un servidor local')
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=sorted(SCENARIOS),
+                        help='Escenarios a ejecutar (default: todos)')
+    parser.add_argument('-l', '--levels', nargs='+', default=['basic', 'styled', 'dangerous'],
+                        help='Niveles de payload (default: basic styled dangerous)')
+    parser.add_argument('-c', '--concurrency', type=int, default=1, help='Concurrencia del scanner (default: 1)')
+    parser.add_argument('--adaptive', action='store_true', help='Escanear con --adaptive')
+    parser.add_argument('--batch', action='store_true', help='Escanear con --batch')
+    parser.add_argument('--stream', action='store_true', help='Escanear con --stream')
+    parser.add_argument('--payloads', type=int, metavar='N',
+                        help='Usar un corpus sintético de N plantillas (nivel custom) en vez de -l')
+    parser.add_argument('--min-recall', type=float, metavar='R',
+                        help='Salir con código 1 si el recall de algún escenario es menor que R')
+    parser.add_argument('--no-memory', action='store_true', help='No medir memoria (evita la segunda pasada)')
+    parser.add_argument('--json', action='store_true', help='Salida JSON')
+    parser.add_argument('--out', metavar='FILE', help='Guardar también el JSON en FILE')
+    args = parser.parse_args()
+
+    scanner_kwargs = {
+        'delay': 0,
+        'timeout': 30,
+        'concurrency': args.concurrency,
+        'adaptive': args.adaptive,
+        'batch': args.batch,
+        'stream': args.stream,
+    }
+    corpus = None
+    if args.payloads:
+        corpus = write_corpus(args.payloads)
+        scanner_kwargs['payload_files'] = [corpus]
+        args.levels = ['custom']
+    try:
+        results = [bench_scenario(name, SCENARIOS[name], scanner_kwargs, args.levels, memory=not args.no_memory)
+                   for name in args.scenarios]
+    finally:
+        if corpus:
+            os.unlink(corpus)
+    report = {
+        'version': htin2.__version__,
+        'python': platform.python_version(),
+        'scanner': dict({k: v for k, v in scanner_kwargs.items() if k != 'payload_files'},
+                        levels=args.levels, payloads=args.payloads),
+        'results': results,
+    }
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'escenario':<10} {'peticiones':>10} {'s':>8} {'req/s':>8} {'MB':>7} {'precision':>10} {'recall':>7}")
+        for r in results:
+            peak = f"{r['peak_memory_mb']:.2f}" if r['peak_memory_mb'] is not None else '-'
+            print(f"{r['scenario']:<10} {r['requests']:>10} {r['seconds']:>8.2f} {r['requests_per_second']:>8} "
+                  f"{peak:>7} {r['precision']:>10} {r['recall']:>7}")
+
+    if args.min_recall is not None:
+        low = [r['scenario'] for r in results if r['recall'] < args.min_recall]
+        if low:
+            print(f"recall < {args.min_recall} en: {', '.join(low)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
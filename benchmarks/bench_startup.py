@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark del arranque en frío de la CLI.
+
+Lanza un intérprete nuevo por medida (como los wrappers que ejecutan la
+herramienta una vez por objetivo) y mide:
+  - --version y --help;
+  - un error de argumentos (sin -u/--targets);
+  - import del módulo + make_scanner(), lo mínimo antes del primer escaneo.
+
+Se toma la mediana y el mínimo de --repeat ejecuciones. --script permite medir
+otra copia de htin2.py (p.ej. una versión anterior) para comparar.
+
+Uso: python3 benchmarks/bench_startup.py [--repeat 20] [--script RUTA] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+DEFAULT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'htin2.py')
+
+
+def cases(script):
+    directory, module = os.path.split(os.path.abspath(script))
+    module = os.path.splitext(module)[0]
+    return {
+        'version': [sys.executable, script, '--version'],
+        'help': [sys.executable, script, '--help'],
+        'arg_error': [sys.executable, script, '--yes'],
+        'scanner': [sys.executable, '-c',
+                    f"import sys; sys.path.insert(0, {directory!r}); import {module}; "
+                    f"{module}.make_scanner(delay=0)"],
+    }
+
+
+def measure(cmd, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del arranque en frío de la CLI')
+    parser.add_argument('--repeat', type=int, default=20, help='Ejecuciones por caso (default: 20)')
+    parser.add_argument('--script', default=DEFAULT_SCRIPT, help='htin2.py a medir (default: el del repositorio)')
+    parser.add_argument('--json', action='store_true', help='Salida JSON')
+    args = parser.parse_args()
+
+    baseline = measure([sys.executable, '-c', 'pass'], args.repeat)
+    results = []
+    for name, cmd in cases(args.script).items():
+        times = measure(cmd, args.repeat)
+        results.append({
+            'case': name,
+            'median_ms': round(statistics.median(times) * 1000, 1),
+            'min_ms': round(min(times) * 1000, 1),
+        })
+    report = {
+        'python': sys.version.split()[0],
+        'interpreter_median_ms': round(statistics.median(baseline) * 1000, 1),
+        'results': results,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"intérprete vacío: {report['interpreter_median_ms']:.1f} ms (mediana)")
+    print(f"{'caso':<10} {'mediana ms':>11} {'mín ms':>8}")
+    for r in results:
+        print(f"{r['case']:<10} {r['median_ms']:>11.1f} {r['min_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP local y deliberadamente vulnerable para los benchmarks.
+
+La página principal (/) tiene `forms` formularios de `width` campos cada uno.
+El tipo de cada entrada sale del patrón `pattern` (se recorre cíclicamente):
+
+  r  refleja el valor tal cual en el texto        (vulnerable)
+  a  refleja el valor tal cual en un atributo     (vulnerable)
+  q  refleja el valor con solo las comillas escapadas como entidades
+     (' -> &#39;, " -> &quot;) en el texto         (vulnerable)
+  e  refleja el valor escapado con html.escape    (no vulnerable)
+  n  no refleja el valor                          (no vulnerable)
+
+Los parámetros de la query de / siguen la misma regla según su primera letra
+(?r1=x&e1=x&n1=x). Cada respuesta se rellena hasta `page_kb` KB y se retrasa
+`latency_ms` ms. El servidor cuenta las peticiones atendidas y sabe qué
+entradas son vulnerables (la "verdad" para precision/recall).
+
+Uso: python3 benchmarks/testserver.py [--port 8000] [--forms 5] [--width 4] [--pattern rnne] [--page-kb 50] [--latency-ms 20]
+"""
+
+import html
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+VULNERABLE_KINDS = ('r', 'a', 'q')
+FILLER = '<p class="filler">Lorem ipsum dolor sit amet, consectetur adipiscing elit &amp; sed do eiusmod.</p>\n'
+
+
+class ServerConfig:
+    def __init__(self, forms=5, width=4, pattern='rnne', page_kb=0, latency_ms=0):
+        if not pattern or set(pattern) - set('raqen'):
+            raise ValueError("pattern solo admite las letras r, a, q, e y n")
+        self.forms = forms
+        self.width = width
+        self.pattern = pattern
+        self.page_kb = page_kb
+        self.latency_ms = latency_ms
+
+    def field_kind(self, form, index):
+        return self.pattern[(form * self.width + index) % len(self.pattern)]
+
+    def fields(self, form):
+        return [(f"{self.field_kind(form, j)}_{form}_{j}", self.field_kind(form, j)) for j in range(self.width)]
+
+    def as_dict(self):
+        return {
+            'forms': self.forms,
+            'width': self.width,
+            'pattern': self.pattern,
+            'page_kb': self.page_kb,
+            'latency_ms': self.latency_ms,
+        }
+
+
+def render_value(kind, value):
+    if kind == 'r':
+        return f'<p>{value}</p>'
+    if kind == 'a':
+        return f'<input type="text" value="{value}">'
+    if kind == 'q':
+        return '<p>{}</p>'.format(value.replace("'", '&#39;').replace('"', '&quot;'))
+    if kind == 'e':
+        return f'<p>{html.escape(value)}</p>'
+    return ''
+
+
+class BenchServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, BenchHandler)
+        self.config = config
+        self.requests_served = 0
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.requests_served += 1
+
+    def vulnerable_inputs(self, params=()):
+        """Nombres de las entradas vulnerables (campos de / más los `params` de la query)."""
+        names = {name for form in range(self.config.forms)
+                 for name, kind in self.config.fields(form) if kind in VULNERABLE_KINDS}
+        names.update(p for p in params if p[:1] in VULNERABLE_KINDS)
+        return names
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class BenchHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # cabeceras y cuerpo van en escrituras separadas: sin esto Nagle + ACK
+    # retrasado añaden ~40 ms a cada respuesta y el benchmark mide eso
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, parts):
+        config = self.server.config
+        body = ''.join(parts)
+        if config.page_kb:
+            missing = config.page_kb * 1024 - len(body)
+            if missing > 0:
+                body += FILLER * (missing // len(FILLER) + 1)
+        data = f'<html><head><title>bench</title></head><body>{body}</body></html>'.encode('utf-8')
+
+        if config.latency_ms:
+            time.sleep(config.latency_ms / 1000.0)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _index(self, query):
+        config = self.server.config
+        parts = [render_value(name[:1], values[0]) for name, values in query.items()]
+        for form in range(config.forms):
+            method = 'post' if form % 2 else 'get'
+            parts.append(f'<form action="/f/{form}" method="{method}">')
+            parts.extend(f'<input type="text" name="{name}">' for name, _ in config.fields(form))
+            parts.append('<input type="submit" value="Enviar"></form>')
+        return parts
+
+    def _form(self, form, values):
+        config = self.server.config
+        if not 0 <= form < config.forms:
+            return ['<p>no existe</p>']
+        return [render_value(kind, values.get(name, [''])[0]) for name, kind in config.fields(form)]
+
+    def _handle(self, values):
+        self.server.count()
+        path = urlsplit(self.path).path
+        if path == '/':
+            self._reply(self._index(values))
+        elif path.startswith('/f/') and path[3:].isdigit():
+            self._reply(self._form(int(path[3:]), values))
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    def do_GET(self):
+        self._handle(parse_qs(urlsplit(self.path).query, keep_blank_values=True))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0) or 0)
+        body = self.rfile.read(length).decode('utf-8', errors='replace')
+        self._handle(parse_qs(body, keep_blank_values=True))
+
+
+def start_server(config, host='127.0.0.1', port=0):
+    """Arranca el servidor en un hilo daemon y lo devuelve (ver base_url)."""
+    server = BenchServer((host, port), config)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor vulnerable local para benchmarks')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--forms', type=int, default=5)
+    parser.add_argument('--width', type=int, default=4)
+    parser.add_argument('--pattern', default='rnne')
+    parser.add_argument('--page-kb', type=int, default=0)
+    parser.add_argument('--latency-ms', type=int, default=0)
+    args = parser.parse_args()
+
+    config = ServerConfig(args.forms, args.width, args.pattern, args.page_kb, args.latency_ms)
+    server = BenchServer(('127.0.0.1', args.port), config)
+    print(f"Sirviendo en {server.base_url} ({config.as_dict()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -12,21 +12,54 @@ Uso: python3 htin2.py [opciones]
 
 import os
 import sys
+import math
+import atexit
 import json
 import argparse
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse, parse_qs, urlencode, urlsplit, urlunsplit
+import importlib
+from urllib.parse import urljoin, urlparse, parse_qs, urlencode, urlsplit, urlunsplit, quote, quote_plus
 import re
 import time
 from datetime import datetime
 import html
-import uuid
+import textwrap
+import random
+import contextlib
+import functools
+import collections
+import collections.abc
+import itertools
+import threading
 
 __version__ = "1.1"
 __author__ = "Airon Delfino (nunu) + parche ChatGPT"
 
 
+class _LazyModule:
+    """Módulo que se importa en el primer acceso a uno de sus atributos.
+
+    requests, urllib3, bs4 y asyncio suponen la mayor parte del tiempo de
+    arranque; así --help, --version y los errores de argumentos no los cargan
+    y solo se pagan cuando empieza un escaneo.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+requests = _LazyModule('requests')
+urllib3 = _LazyModule('urllib3')
+bs4 = _LazyModule('bs4')
+asyncio = _LazyModule('asyncio')
+multiprocessing = _LazyModule('multiprocessing')
+
+
 class Colors:
     RED = '\033[91m'
     GREEN = '\033[92m'
@@ -51,13 +84,1644 @@ class Colors:
         Colors.END = ''
 
 
+# ---------------------------------------------------------------------------
+# Motor de detección
+#
+# Se trabaja directamente sobre los bytes de la respuesta: primero se busca el
+# marcador (una sola pasada, sin decodificar ni parsear la página) y solo se
+# decodifica una ventana acotada alrededor de cada coincidencia para saber en
+# qué contexto HTML quedó reflejado.
+# ---------------------------------------------------------------------------
+
+# marcador = prefijo aleatorio del scanner (12 hex) + contador en hex (ver make_marker)
+MARKER_RE = re.compile(rb'__htin_[0-9a-f]{6,24}__')
+DANGEROUS_TAGS = ('script', 'iframe', 'img', 'svg', 'object', 'embed')
+# etiquetas peligrosas tanto literales como codificadas con entidades (equivale
+# a hacer html.unescape + find_all sobre el documento completo)
+DANGEROUS_TAG_RE = re.compile(
+    rb'(?:<|&lt;|&#0*60;|&#x0*3c;)(' + b'|'.join(t.encode() for t in DANGEROUS_TAGS) + rb')(?=[\s/>]|&gt;)',
+    re.IGNORECASE,
+)
+# marcador con el '_' codificado como entidad (p.ej. &#95;&#95;htin&#95;...)
+ENCODED_MARKER_HINT_RE = re.compile(rb'htin(?:&#0*95;|&#x0*5f;|&lowbar;)', re.IGNORECASE)
+CONTEXT_WINDOW = 512
+STREAM_CHUNK = 64 * 1024
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'application/xml', 'text/xml')
+ATTR_NAME_RE = re.compile(rb'([a-zA-Z_:][-\w:.]*)\s*=')
+
+
+def _as_bytes(body):
+    if body is None:
+        return b''
+    if isinstance(body, str):
+        return body.encode('utf-8', errors='replace')
+    return body
+
+
+def classify_context(text, pos):
+    """Clasifica el contexto HTML de la posición `pos` dentro de `text`.
+
+    Devuelve 'comment', 'script', 'style', 'attribute', 'tag' o 'text'. Solo
+    mira lo que hay antes de `pos`, así que basta con una ventana acotada.
+    """
+    before = text[:pos]
+    lower = before.lower()
+
+    comment_open = lower.rfind('<!--')
+    if comment_open != -1 and lower.find('-->', comment_open + 4) == -1:
+        return 'comment'
+
+    for tag in ('script', 'style'):
+        opened = lower.rfind('<' + tag)
+        if opened != -1 and lower.find('</' + tag, opened) == -1:
+            # dentro de <script ...> pero aún en la etiqueta de apertura
+            if lower.find('>', opened) == -1:
+                break
+            return tag
+
+    tag_open = _open_tag(before)
+    if tag_open != -1:
+        if _open_quote(before[tag_open:]) or re.search(r'=\s*[^\s"\'>]*$', before[tag_open:]):
+            return 'attribute'
+        return 'tag'
+
+    return 'text'
+
+
+def _open_quote(tag_text):
+    """Comilla del valor de atributo que queda abierto al final de `tag_text` ('' si ninguno)."""
+    quote = ''
+    for ch in tag_text:
+        if quote:
+            if ch == quote:
+                quote = ''
+        elif ch in '"\'':
+            quote = ch
+    return quote
+
+
+def _open_tag(text):
+    """Posición del '<' de la etiqueta que queda abierta al final de `text` (-1 si ninguna).
+
+    Sigue las comillas igual que _open_quote: un '>' dentro de un valor de
+    atributo (title="x>y") no cierra la etiqueta.
+    """
+    start = -1
+    quote = ''
+    for i, ch in enumerate(text):
+        if start == -1:
+            if ch == '<' and text[i + 1:i + 2].isalpha():
+                start = i
+        elif quote:
+            if ch == quote:
+                quote = ''
+        elif ch in '"\'':
+            quote = ch
+        elif ch == '>':
+            start = -1
+    return start
+
+
+class MarkerMatcher:
+    """Localiza en una sola pasada cualquiera de los marcadores activos.
+
+    Todos los marcadores comparten formato, así que una única regex compilada
+    (MARKER_RE) recorre el cuerpo una vez y cada coincidencia se resuelve con
+    una búsqueda en un set: el coste no crece con el número de marcadores.
+    """
+
+    def __init__(self, markers=()):
+        self.markers = set(markers)
+
+    def add(self, marker):
+        self.markers.add(marker)
+
+    def discard(self, marker):
+        self.markers.discard(marker)
+
+    def __len__(self):
+        return len(self.markers)
+
+    def finditer(self, body):
+        for match in MARKER_RE.finditer(_as_bytes(body)):
+            marker = match.group().decode('ascii')
+            if marker in self.markers:
+                yield marker, match.start()
+
+    def find_all(self, body):
+        """Devuelve {marcador: primera posición} de los marcadores reflejados."""
+        hits = {}
+        for marker, pos in self.finditer(body):
+            hits.setdefault(marker, pos)
+        return hits
+
+
+def tag_signature(body):
+    """Huella de las etiquetas peligrosas de una respuesta.
+
+    Counter de (etiqueta, atributos) con los atributos ordenados; restando la
+    huella de la respuesta base a la de la respuesta inyectada quedan solo las
+    etiquetas que aparecieron por la inyección.
+    """
+    raw = _as_bytes(body)
+    signature = collections.Counter()
+    for match in DANGEROUS_TAG_RE.finditer(raw):
+        tail = raw[match.end():match.end() + 512]
+        for end in (tail.find(b'>'), tail.find(b'&gt;')):
+            if end != -1:
+                tail = tail[:end]
+        attrs = tuple(sorted({a.decode('ascii', errors='replace').lower() for a in ATTR_NAME_RE.findall(tail)}))
+        signature[(match.group(1).decode().lower(), attrs)] += 1
+    return signature
+
+
+class BaselineCache:
+    """LRU acotado de huellas de respuestas base, por (método, URL, parámetros)."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Devuelve el valor cacheado o lo calcula; varios hilos pidiendo la
+        misma clave a la vez esperan a un único cálculo."""
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            key_lock = self._pending.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self.get(key)
+            if value is None:
+                value = compute()
+                if value is not None:
+                    self.put(key, value)
+        with self._lock:
+            self._pending.pop(key, None)
+        return value
+
+    def __len__(self):
+        return len(self._data)
+
+
+def reflection_context(body, pos, length):
+    """Decodifica solo la ventana alrededor de `pos` y clasifica el contexto."""
+    start = max(0, pos - CONTEXT_WINDOW)
+    window = body[start:pos + length + CONTEXT_WINDOW].decode('utf-8', errors='replace')
+    offset = len(body[start:pos].decode('utf-8', errors='replace'))
+    return classify_context(window, offset), window
+
+
+# Sonda de --adaptive: el marcador seguido de los caracteres necesarios para
+# salir de cualquier contexto. Según dónde se refleje y qué caracteres lleguen
+# sin escapar se eligen los payloads (con el prefijo que cierra ese contexto).
+PROBE_CHARS = '\'"<>/'
+PROBE_TEMPLATE = '{marker}' + PROBE_CHARS
+PROBE_MAX_HITS = 8
+# contexto -> (prefijo de cierre, caracteres que deben reflejarse tal cual)
+CONTEXT_BREAKOUTS = {
+    'text': ('', '<'),
+    'attribute': ('\'">', '<>'),
+    'tag': ('>', '<>'),
+    'comment': ('-->', '<>'),
+    'script': ('</script>', '</'),
+    'style': ('</style>', '</'),
+}
+
+
+# forma escapada de un carácter de la sonda: entidad HTML (&#39; &quot; &lt;...),
+# escape de JavaScript (\' \") o codificación URL (%3C)
+PROBE_ESCAPE_RE = re.compile(rb'&#?[0-9a-zA-Z]{1,8};|\\.|%[0-9a-fA-F]{2}')
+
+
+def probe_echo(body, start):
+    """Caracteres de PROBE_CHARS que la respuesta devuelve tal cual a partir de `start`.
+
+    Se recorre la sonda en orden: cada carácter puede volver tal cual, escapado
+    (entidad, barra invertida o %xx: más bytes que el original) o eliminado (no
+    ocupa nada). Por eso no basta con mirar un número fijo de bytes: si ' se
+    convierte en &#39; el '<' sin escapar queda más adelante.
+    """
+    echoed = set()
+    for ch in PROBE_CHARS.encode('ascii'):
+        if body[start:start + 1] == bytes((ch,)):
+            echoed.add(chr(ch))
+            start += 1
+            continue
+        escaped = PROBE_ESCAPE_RE.match(body, start)
+        if escaped:
+            start = escaped.end()
+        # si no, la aplicación lo eliminó: el siguiente carácter empieza aquí
+    return echoed
+
+
+def probe_context(body, pos, length):
+    """Contexto de una reflexión de la sonda, o None si no se puede salir de él
+    (algún carácter necesario para ese contexto no vuelve sin escapar)."""
+    context, _ = reflection_context(body, pos, length)
+    _, needed = CONTEXT_BREAKOUTS[context]
+    if context == 'attribute':
+        before = body[max(0, pos - CONTEXT_WINDOW):pos].decode('utf-8', errors='replace')
+        needed += _open_quote(before[_open_tag(before):])
+    echoed = probe_echo(body, pos + length)
+    if all(ch in echoed for ch in needed):
+        return context
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Crawler
+# ---------------------------------------------------------------------------
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+SKIP_EXTENSIONS = (
+    '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.webp', '.bmp', '.css', '.js', '.map',
+    '.pdf', '.zip', '.gz', '.tar', '.rar', '.7z', '.exe', '.dmg', '.iso', '.mp3', '.mp4',
+    '.avi', '.mov', '.webm', '.woff', '.woff2', '.ttf', '.eot', '.doc', '.docx', '.xls', '.xlsx',
+)
+
+
+def normalize_url(url):
+    """Forma canónica de una URL para deduplicar: esquema y host en minúsculas,
+    sin puerto por defecto ni fragmento, ruta vacía como '/' y query ordenada."""
+    parsed = urlsplit(url)
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').lower()
+    if parsed.port and parsed.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parsed.port}"
+    query = urlencode(sorted(parse_qs(parsed.query, keep_blank_values=True).items()), doseq=True)
+    return urlunsplit((scheme, host, parsed.path or '/', query, ''))
+
+
+def _origin(url):
+    parsed = urlsplit(normalize_url(url))
+    return parsed.scheme, parsed.netloc
+
+
+# ---------------------------------------------------------------------------
+# Payloads
+#
+# Cada plantilla se compila una sola vez: se parte por {marker} y se guardan
+# las partes ya codificadas (y ya escapadas para la query string), así que
+# insertar el marcador en cada petición es un simple join de cadenas.
+# ---------------------------------------------------------------------------
+
+# variantes de codificación (--encodings): se aplican a las partes de la
+# plantilla, nunca al marcador (solo lleva [a-z0-9_])
+PAYLOAD_ENCODINGS = {
+    'url': lambda text: quote(text, safe=''),
+    'double-url': lambda text: quote(quote(text, safe=''), safe=''),
+    'html': lambda text: ''.join(f'&#{ord(ch)};' if ch in '<>"\'&' else ch for ch in text),
+}
+
+
+class Payload:
+    """Plantilla de payload precompilada (partes alrededor de cada {marker})."""
+
+    __slots__ = ('template', 'level', 'encoding', 'key', 'raw_parts', 'parts', 'quoted_parts')
+
+    def __init__(self, template, level, encoding='raw'):
+        self.template = template
+        self.level = level
+        self.encoding = encoding
+        # identidad estable para el diario: la plantilla tal cual en la variante raw
+        self.key = template if encoding == 'raw' else f"{encoding}:{template}"
+        self.raw_parts = tuple(template.split('{marker}'))
+        encode = PAYLOAD_ENCODINGS.get(encoding)
+        self.parts = tuple(encode(part) for part in self.raw_parts) if encode else self.raw_parts
+        self.quoted_parts = tuple(quote_plus(part) for part in self.parts)
+
+    def render(self, marker):
+        return marker.join(self.parts)
+
+    def quoted(self, marker):
+        """El payload listo para ir en la query string (equivale a quote_plus(render))."""
+        return marker.join(self.quoted_parts)
+
+    def decoded(self, marker):
+        """Lo que debe aparecer en la respuesta si la aplicación decodificó la variante."""
+        return marker.join(self.raw_parts)
+
+    def with_prefix(self, prefix):
+        return Payload(prefix + self.template, self.level, self.encoding)
+
+
+class PayloadSet:
+    """Payloads compilados por nivel, sin duplicados.
+
+    Cada plantilla se añade en crudo y en las variantes de `encodings`; dos
+    payloads son equivalentes si envían exactamente lo mismo (una plantilla
+    repetida, una variante que no cambia nada o la misma plantilla en dos de
+    los niveles pedidos) y solo se envía el primero. Los ficheros
+    (--payload-file) se leen una vez por proceso.
+    """
+
+    _files = {}
+
+    def __init__(self, levels=None, encodings=()):
+        self.encodings = tuple(encodings)
+        self.levels = {}
+        self._seen = {}
+        for level, templates in (levels or {}).items():
+            self.extend(level, templates)
+
+    def add(self, level, template):
+        if '{marker}' not in template:
+            # sin marcador no hay forma de localizar la reflexión
+            template += '{marker}'
+        seen = self._seen.setdefault(level, set())
+        for encoding in ('raw',) + self.encodings:
+            payload = Payload(template, level, encoding)
+            if payload.parts in seen:
+                continue
+            seen.add(payload.parts)
+            self.levels.setdefault(level, []).append(payload)
+
+    def extend(self, level, templates):
+        for template in templates:
+            self.add(level, template)
+
+    @classmethod
+    def read_file(cls, path):
+        """Plantillas de un fichero (una por línea, '#' para comentarios), cacheadas por ruta y mtime."""
+        key = (os.path.abspath(path), os.path.getmtime(path))
+        templates = cls._files.get(key)
+        if templates is None:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                templates = [line.rstrip('\r\n') for line in f]
+            templates = [t for t in templates if t.strip() and not t.lstrip().startswith('#')]
+            cls._files[key] = templates
+        return templates
+
+    def load(self, path, level='custom'):
+        self.extend(level, self.read_file(path))
+
+    def iter(self, payload_levels):
+        sent = set()
+        for level in payload_levels:
+            for payload in self.levels.get(level, ()):
+                if payload.parts not in sent:
+                    sent.add(payload.parts)
+                    yield level, payload
+
+    def __len__(self):
+        return sum(len(payloads) for payloads in self.levels.values())
+
+
+PROBE_PAYLOAD = Payload(PROBE_TEMPLATE, 'probe')
+
+
+class QueryTemplate:
+    """Query string de una URL con los pares ya codificados.
+
+    render() sustituye el valor de los parámetros inyectados (ya codificados
+    con Payload.quoted) y une el resto tal cual: no se llama a urlencode por
+    petición. El resultado es el mismo que urlencode(qs, doseq=True).
+    """
+
+    def __init__(self, url, qs):
+        parsed = urlsplit(url)
+        self.base = urlunsplit((parsed.scheme, parsed.netloc, parsed.path, '', ''))
+        self.fragment = parsed.fragment
+        self.pairs = [(name, quote_plus(name), [quote_plus(str(value)) for value in values])
+                      for name, values in qs.items()]
+        self.target = self.render({})
+
+    def render(self, values):
+        query = []
+        for name, quoted_name, quoted_values in self.pairs:
+            if name in values:
+                query.append(f"{quoted_name}={values[name]}")
+            else:
+                query.extend(f"{quoted_name}={value}" for value in quoted_values)
+        url = f"{self.base}?{'&'.join(query)}" if query else self.base
+        return f"{url}#{self.fragment}" if self.fragment else url
+
+
+# ---------------------------------------------------------------------------
+# Puntos de inyección
+#
+# Cada tipo de entrada (query, formulario, cabecera, cookie, segmento de ruta,
+# campo JSON) sabe construir su petición con uno o varios valores inyectados;
+# jobs, peticiones agrupadas, sondas, detección, diario y caché son comunes.
+# ---------------------------------------------------------------------------
+
+# tipo de hallazgo -> (clave con el nombre de la entrada, etiqueta en los logs)
+INPUT_TYPES = {
+    'url_parameter': ('parameter', 'Parámetro'),
+    'form_field': ('field', 'Campo'),
+    'header': ('header', 'Cabecera'),
+    'cookie': ('cookie', 'Cookie'),
+    'path_segment': ('segment', 'Segmento'),
+    'json_field': ('field', 'Campo JSON'),
+    'stored': ('input', 'Entrada'),
+}
+
+
+def finding_input(finding):
+    """Nombre de la entrada vulnerable de un hallazgo, sea del tipo que sea."""
+    name_key, _ = INPUT_TYPES.get(finding.get('type'), ('parameter', None))
+    return finding.get(name_key) or ''
+
+
+class Finding(collections.abc.MutableMapping):
+    """Hallazgo compacto: los campos comunes van en __slots__ y solo los
+    opcionales (encoding, target, cached, found_at...) en un dict aparte.
+
+    Se comporta como el dict de siempre ({'type', <parameter|field|...>,
+    'payload', 'marker', 'reason', 'context', 'level', ['method'], 'url', ...}),
+    así que reportes, diario y caché no cambian. Razón y nivel se internan:
+    se repiten en casi todos los hallazgos.
+    """
+
+    __slots__ = ('type', 'input', 'payload', 'marker', 'reason', 'context', 'level', 'method', 'url', 'extra')
+    FIELDS = ('payload', 'marker', 'reason', 'context', 'level', 'method', 'url')
+
+    def __init__(self, type, input, payload, marker, reason, context, level, method=None, url=None, **extra):
+        self.type = type
+        self.input = input
+        self.payload = payload
+        self.marker = marker
+        self.reason = sys.intern(reason)
+        self.context = context
+        self.level = sys.intern(level)
+        self.method = method
+        self.url = url
+        self.extra = extra or None
+
+    @property
+    def name_key(self):
+        return INPUT_TYPES[self.type][0]
+
+    def _slot(self, key):
+        if key == 'type':
+            return 'type'
+        if key == self.name_key:
+            return 'input'
+        if key in self.FIELDS:
+            return key
+        return None
+
+    def __getitem__(self, key):
+        slot = self._slot(key)
+        if slot is not None and (slot != 'method' or self.method is not None):
+            return getattr(self, slot)
+        if slot is None and self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        slot = self._slot(key)
+        if slot is not None:
+            setattr(self, slot, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if self.extra is None or key not in self.extra:
+            raise KeyError(key)
+        del self.extra[key]
+
+    def __iter__(self):
+        yield 'type'
+        yield self.name_key
+        for key in self.FIELDS:
+            if key != 'method' or self.method is not None:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Finding({dict(self)!r})"
+
+
+def _json_default(value):
+    # json.dumps(default=...): los Finding se serializan como el dict equivalente
+    if isinstance(value, collections.abc.Mapping):
+        return dict(value)
+    return str(value)
+
+
+class InjectionPoint:
+    """Entradas inyectables de un mismo tipo sobre una petición base.
+
+    `names` son las entradas; request(payload, markers) devuelve la petición
+    (method, url, params, data y, según el tipo, headers o json) con el
+    payload inyectado en cada entrada de `markers` ({entrada: marcador}), así
+    sirve igual para un job normal que para uno agrupado. baseline() es la
+    petición sin inyectar.
+    """
+
+    type = None
+    label = None
+
+    def __init__(self, url, names, method='GET'):
+        self.url = url
+        self.names = list(names)
+        self.method = method
+        self.target = url
+
+    def request(self, payload, markers):
+        raise NotImplementedError
+
+    def baseline(self):
+        return {'method': self.method, 'url': self.url, 'params': None, 'data': None}
+
+    @property
+    def endpoint(self):
+        """Clave de la entrada en la caché (como las de formularios y parámetros)."""
+        base = normalize_url(self.url).split('?', 1)[0]
+        return f"{self.type} {self.method} {base} {','.join(sorted(self.names))}"
+
+
+class QueryPoint(InjectionPoint):
+    type = 'url_parameter'
+    label = 'parámetros'
+
+    def __init__(self, url, qs, names):
+        super().__init__(url, names)
+        self.query = QueryTemplate(url, qs)
+        self.target = self.query.target
+
+    def request(self, payload, markers):
+        values = {name: payload.quoted(marker) for name, marker in markers.items()}
+        return {'method': 'GET', 'url': self.query.render(values), 'params': None, 'data': None}
+
+    def baseline(self):
+        return {'method': 'GET', 'url': self.target, 'params': None, 'data': None}
+
+
+class FormPoint(InjectionPoint):
+    type = 'form_field'
+    label = 'campos'
+
+    def __init__(self, url, method, base_data, names):
+        super().__init__(url, names, method)
+        self.base_data = base_data
+
+    def _request(self, data):
+        return {
+            'method': self.method,
+            'url': self.url,
+            'params': None if self.method == 'POST' else data,
+            'data': data if self.method == 'POST' else None,
+        }
+
+    def request(self, payload, markers):
+        data = self.base_data.copy()
+        for name, marker in markers.items():
+            data[name] = payload.render(marker)
+        return self._request(data)
+
+    def baseline(self):
+        return self._request(self.base_data)
+
+
+class HeaderPoint(InjectionPoint):
+    type = 'header'
+    label = 'cabeceras'
+
+    def request(self, payload, markers):
+        request = self.baseline()
+        request['headers'] = {name: payload.render(marker) for name, marker in markers.items()}
+        return request
+
+
+class CookiePoint(InjectionPoint):
+    """Cookies `names` (por defecto todas las de `cookies`, las de la sesión).
+    Se envía la cabecera Cookie completa: requests no sustituye una cookie de
+    la sesión con el mismo nombre y así el valor inyectado llega tal cual."""
+
+    type = 'cookie'
+    label = 'cookies'
+
+    def __init__(self, url, cookies, names=None):
+        super().__init__(url, cookies if names is None else names)
+        self.cookies = cookies
+
+    def _request(self, cookies):
+        request = super().baseline()
+        if cookies:
+            request['headers'] = {'Cookie': '; '.join(f"{name}={value}" for name, value in cookies.items())}
+        return request
+
+    def request(self, payload, markers):
+        cookies = dict(self.cookies)
+        for name, marker in markers.items():
+            cookies[name] = payload.render(marker)
+        return self._request(cookies)
+
+    def baseline(self):
+        return self._request(self.cookies)
+
+
+class PathPoint(InjectionPoint):
+    """Cada segmento no vacío de la ruta, nombrado 'posición:valor'."""
+
+    type = 'path_segment'
+    label = 'segmentos de ruta'
+
+    def __init__(self, url):
+        self.parsed = urlsplit(url)
+        self.segments = self.parsed.path.split('/')
+        self._index = {f"{i}:{segment}": i for i, segment in enumerate(self.segments) if segment}
+        super().__init__(url, self._index)
+
+    def request(self, payload, markers):
+        segments = list(self.segments)
+        for name, marker in markers.items():
+            segments[self._index[name]] = quote(payload.render(marker), safe='')
+        url = urlunsplit(self.parsed._replace(path='/'.join(segments)))
+        return {'method': 'GET', 'url': url, 'params': None, 'data': None}
+
+    @property
+    def endpoint(self):
+        return f"{self.type} GET {normalize_url(self.url).split('?', 1)[0]}"
+
+
+def _json_fields(value, path=()):
+    # rutas de los valores de texto de un documento JSON
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _json_fields(item, path + (key,))
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            yield from _json_fields(item, path + (i,))
+    elif isinstance(value, str):
+        yield path
+
+
+class JSONPoint(InjectionPoint):
+    """Campos de texto de un cuerpo JSON de ejemplo enviado por POST (--json-body),
+    nombrados por su ruta con puntos (p.ej. user.name o items.0.title)."""
+
+    type = 'json_field'
+    label = 'campos JSON'
+
+    def __init__(self, url, body):
+        self.body = json.dumps(body)
+        self._paths = {'.'.join(map(str, path)) or '$': path for path in _json_fields(body)}
+        super().__init__(url, self._paths, 'POST')
+
+    def _request(self, body):
+        return {'method': 'POST', 'url': self.url, 'params': None, 'data': None, 'json': body}
+
+    def request(self, payload, markers):
+        body = json.loads(self.body)
+        for name, marker in markers.items():
+            path = self._paths[name]
+            if not path:
+                body = payload.render(marker)
+                continue
+            parent = body
+            for key in path[:-1]:
+                parent = parent[key]
+            parent[path[-1]] = payload.render(marker)
+        return self._request(body)
+
+    def baseline(self):
+        return self._request(json.loads(self.body))
+
+
+# marcador enviado (--stored): entrada que lo envió y momento del envío, para
+# atribuir lo que encuentre el barrido. Se guardan la URL objetivo y el Payload
+# compartidos por todos los tests de la entrada (el texto a buscar se obtiene
+# con template.decoded(marcador)), no la petición de cada test.
+SentMarker = collections.namedtuple('SentMarker', 'type input method url template level ts')
+
+
+# página que respondió 304 Not Modified (--incremental): en lugar del
+# BeautifulSoup se devuelven sus enlaces y entradas guardados en la caché
+CachedPage = collections.namedtuple('CachedPage', 'url links endpoints')
+
+
+class Crawler:
+    """Rastreo acotado (BFS por niveles) de los enlaces del mismo origen.
+
+    Cada nivel de la frontera se descarga en paralelo con `workers` hilos.
+    `fetch` recibe una URL y devuelve el BeautifulSoup de la página.
+    """
+
+    def __init__(self, fetch, start_url, max_depth=2, max_pages=100, include=None, exclude=None, workers=4):
+        self.fetch = fetch
+        self.start_url = start_url
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.include = [re.compile(p) for p in include or []]
+        self.exclude = [re.compile(p) for p in exclude or []]
+        self.workers = max(1, workers)
+        self.origin = _origin(start_url)
+
+    def in_scope(self, url):
+        parsed = urlsplit(url)
+        if parsed.scheme not in ('http', 'https') or _origin(url) != self.origin:
+            return False
+        if parsed.path.lower().endswith(SKIP_EXTENSIONS):
+            return False
+        if self.include and not any(p.search(url) for p in self.include):
+            return False
+        return not any(p.search(url) for p in self.exclude)
+
+    @staticmethod
+    def links(base_url, soup):
+        if isinstance(soup, CachedPage):
+            yield from soup.links
+            return
+        for tag, attr in (('a', 'href'), ('area', 'href'), ('frame', 'src'), ('iframe', 'src')):
+            for element in soup.find_all(tag):
+                href = element.get(attr)
+                if href and not href.startswith(('javascript:', 'mailto:', 'tel:', 'data:')):
+                    yield urljoin(base_url, href)
+
+    def _safe_fetch(self, url):
+        try:
+            return self.fetch(url)
+        except Exception:
+            return None
+
+    def crawl(self):
+        """Genera (url, soup) de cada página alcanzable dentro de los límites."""
+        start = normalize_url(self.start_url)
+        seen = {start}
+        frontier = [self.start_url]
+        pages = 0
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for depth in range(self.max_depth + 1):
+                frontier = frontier[:self.max_pages - pages]
+                if not frontier:
+                    break
+
+                next_frontier = []
+                for url, soup in zip(frontier, pool.map(self._safe_fetch, frontier)):
+                    if soup is None:
+                        continue
+                    pages += 1
+                    if depth < self.max_depth:
+                        for link in self.links(url, soup):
+                            normalized = normalize_url(link)
+                            if normalized not in seen and self.in_scope(normalized):
+                                seen.add(normalized)
+                                next_frontier.append(normalized)
+                    yield url, soup
+                frontier = next_frontier
+
+
+# ---------------------------------------------------------------------------
+# Diario de escaneo (checkpoint para --resume)
+# ---------------------------------------------------------------------------
+
+class ScanJournal:
+    """Diario JSONL append-only con cada test completado y cada hallazgo.
+
+    Cada línea es un registro independiente ({"kind": "test" | "finding" |
+    "target", ...}) escrito con una sola llamada os.write sobre un descriptor
+    O_APPEND, así que varios procesos del modo batch pueden compartir el
+    fichero y un corte a mitad de escaneo deja como mucho una línea incompleta,
+    que se ignora al reanudar.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        # solo los tests leídos del diario al reanudar: los de esta ejecución
+        # se escriben en el fichero pero no se guardan en memoria
+        self.done = {}
+        self.findings = []
+        self.targets_done = set()
+        if resume and os.path.exists(path):
+            self._load()
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    @staticmethod
+    def reset(path):
+        # empezar un diario nuevo (sin --resume)
+        with open(path, 'w', encoding='utf-8'):
+            pass
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                kind = record.get('kind')
+                if kind == 'test':
+                    self.done[record['key']] = record.get('reflected')
+                elif kind == 'finding':
+                    self.findings.append(record['finding'])
+                elif kind == 'target':
+                    self.targets_done.add(record['url'])
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=_json_default) + '\n'
+        os.write(self._fd, line.encode('utf-8'))
+
+    def is_done(self, key):
+        return key in self.done
+
+    def reflected(self, key):
+        return self.done.get(key) or []
+
+    def record_test(self, key, reflected=None):
+        record = {'kind': 'test', 'key': key, 'ts': time.time()}
+        if reflected is not None:
+            record['reflected'] = reflected
+        self._write(record)
+
+    def record_finding(self, finding):
+        self._write({'kind': 'finding', 'finding': finding, 'ts': time.time()})
+
+    def record_target(self, url):
+        self.targets_done.add(url)
+        self._write({'kind': 'target', 'url': url, 'ts': time.time()})
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class ScanCache:
+    """Caché persistente entre ejecuciones (--cache FILE, JSON).
+
+    Por página guarda los validadores HTTP (ETag/Last-Modified), sus enlaces y
+    las claves de las entradas que contiene (cada formulario o juego de
+    parámetros, identificado por acción, método y campos); por entrada, los
+    niveles probados y los hallazgos. Con --incremental las páginas se piden
+    con GET condicional y solo se prueban las entradas nuevas o cambiadas.
+
+    En modo --targets cada worker carga su copia y devuelve lo que cambió
+    (take) para que el proceso principal lo combine (merge) y guarde una vez.
+    save() escribe un temporal y lo renombra, así un corte no deja el JSON a
+    medias.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+        self.endpoints = {}
+        self._dirty_pages = set()
+        self._dirty_endpoints = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # caché ilegible: se trata como vacía y se reescribe al final
+            return
+        if data.get('version') == self.VERSION:
+            self.pages = data.get('pages', {})
+            self.endpoints = data.get('endpoints', {})
+
+    def page(self, url):
+        return self.pages.get(url)
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store_page(self, url, headers, links):
+        with self._lock:
+            self.pages[url] = {
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'links': links,
+                'endpoints': [],
+                'ts': time.time(),
+            }
+            self._dirty_pages.add(url)
+
+    def add_endpoint(self, url, key):
+        with self._lock:
+            entry = self.pages.get(url)
+            if entry is not None and key not in entry['endpoints']:
+                entry['endpoints'].append(key)
+                self._dirty_pages.add(url)
+
+    def verdict(self, key, levels):
+        """Hallazgos previos de la entrada si se probó con todos los `levels`, si no None."""
+        entry = self.endpoints.get(key)
+        if entry is None or not set(levels) <= set(entry['levels']):
+            return None
+        return entry['findings']
+
+    def store_verdict(self, key, levels, findings):
+        with self._lock:
+            self.endpoints[key] = {'levels': sorted(levels), 'findings': findings, 'ts': time.time()}
+            self._dirty_endpoints.add(key)
+
+    def take(self):
+        with self._lock:
+            state = {
+                'pages': {url: self.pages[url] for url in self._dirty_pages},
+                'endpoints': {key: self.endpoints[key] for key in self._dirty_endpoints},
+            }
+            self._dirty_pages = set()
+            self._dirty_endpoints = set()
+        return state
+
+    def merge(self, state):
+        with self._lock:
+            self.pages.update(state['pages'])
+            self.endpoints.update(state['endpoints'])
+
+    def save(self):
+        with self._lock:
+            data = json.dumps({'version': self.VERSION, 'pages': self.pages, 'endpoints': self.endpoints},
+                              ensure_ascii=False, default=_json_default)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+# ---------------------------------------------------------------------------
+# Reportes
+# ---------------------------------------------------------------------------
+
+class Reporter:
+    """Destino de resultados.
+
+    Ciclo de vida: start(scan_info) al empezar, add(hallazgo) en cuanto se
+    produce cada hallazgo y close(scan_info) al terminar, con las estadísticas
+    finales en scan_info['statistics'].
+    """
+
+    path = None
+
+    def start(self, scan_info):
+        pass
+
+    def add(self, finding):
+        pass
+
+    def close(self, scan_info):
+        pass
+
+
+class ConsoleReporter(Reporter):
+    """Resumen legible en consola al final del escaneo.
+
+    Solo se guardan los `max_findings` primeros hallazgos para el detalle; del
+    resto basta con contarlos (están completos en el reporte de fichero).
+    """
+
+    def __init__(self, max_findings=200):
+        self.max_findings = max_findings
+        self.findings = []
+        self.omitted = 0
+
+    def add(self, finding):
+        if len(self.findings) < self.max_findings:
+            self.findings.append(finding)
+        else:
+            self.omitted += 1
+
+    def close(self, scan_info):
+        stats = scan_info['statistics']
+        targets = scan_info.get('targets')
+
+        print(f"\n{'='*70}")
+        print(f"{Colors.BOLD}REPORTE DE ESCANEO{Colors.END}")
+        print(f"{'='*70}")
+        print(f"\nURL objetivo: {Colors.CYAN}{scan_info['target']}{Colors.END}")
+        if targets is not None:
+            print(f"Objetivos escaneados: {len(targets)}")
+        print(f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"\n{Colors.BOLD}ESTADÍSTICAS:{Colors.END}")
+        print(f"  • Tests realizados: {stats['total_tested']}")
+        print(f"  • Formularios analizados: {stats['forms_tested']}")
+        if stats.get('failed_tests'):
+            print(f"  • Tests fallidos (errores de red/servidor): {Colors.YELLOW}{stats['failed_tests']}{Colors.END}")
+        if stats.get('endpoints_reused'):
+            print(f"  • Entradas sin cambios (veredicto de la caché): {stats['endpoints_reused']}")
+        if stats.get('pages_swept'):
+            print(f"  • Páginas barridas (inyección almacenada): {stats['pages_swept']}")
+        if stats.get('inputs_skipped'):
+            print(f"  • Entradas omitidas (sin reflexión aprovechable): {stats['inputs_skipped']}")
+        if stats.get('headless_rendered'):
+            print(f"  • Hallazgos renderizados en navegador: {stats['headless_rendered']} "
+                  f"(confirmados: {stats['headless_confirmed']})")
+        print(f"  • Vulnerabilidades encontradas: {Colors.RED}{stats['vulnerabilities_found']}{Colors.END}")
+
+        if scan_info.get('profile'):
+            self.print_profile(scan_info['profile'])
+
+        if self.findings:
+            print(f"\n{Colors.BOLD}VULNERABILIDADES DETECTADAS:{Colors.END}\n")
+
+            for i, vuln in enumerate(self.findings, 1):
+                print(f"{Colors.RED}[{i}]{Colors.END} Tipo: {vuln['type']}")
+
+                name_key, label = INPUT_TYPES.get(vuln['type'], (None, None))
+                if name_key:
+                    print(f"    {label}: {vuln[name_key]}")
+                if 'method' in vuln:
+                    print(f"    Método: {vuln['method']}")
+                if vuln.get('found_at'):
+                    print(f"    Encontrado en: {vuln['found_at'][:200]}")
+
+                print(f"    Nivel: {Colors.YELLOW}{vuln['level'].upper()}{Colors.END}")
+                if vuln.get('headless'):
+                    print(f"    Navegador: {HEADLESS_VERDICTS.get(vuln['headless'], vuln['headless'])}")
+                print(f"    Payload (escaped): {html.escape(vuln['payload'][:200])}")
+                print(f"    Razón: {vuln['reason']}")
+                if vuln.get('context'):
+                    print(f"    Contexto: {vuln['context']}")
+                print(f"    URL: {vuln['url'][:200]}")
+                print()
+
+            if self.omitted:
+                print(f"    ... y {self.omitted} más (detalle completo en el reporte de -o)\n")
+
+            print(f"{Colors.BOLD}RECOMENDACIONES:{Colors.END}")
+            print("""
+    1. Sanitizar TODAS las entradas del usuario
+    2. Usar HTML encoding para todas las salidas
+    3. Implementar Content Security Policy (CSP)
+    4. Validar tipos de datos en el servidor
+    5. Usar frameworks con protección anti-XSS incorporada
+    6. Implementar Web Application Firewall (WAF)
+    7. Realizar auditorías de seguridad regulares
+            """)
+        else:
+            print(f"\n{Colors.GREEN}✓ No se encontraron vulnerabilidades de HTML Injection{Colors.END}")
+
+        print(f"{'='*70}\n")
+
+    def print_profile(self, profile):
+        print(f"\n{Colors.BOLD}PERFIL:{Colors.END}")
+        for phase, data in profile['phases'].items():
+            print(f"  • {phase:<9} {data['total_s']:>9.3f} s  ({data['count']} × {data['avg_ms']} ms)")
+        for host, data in profile['hosts'].items():
+            print(f"  • {host}: {data['requests']} peticiones, p50 {data['p50_ms']} ms, "
+                  f"p95 {data['p95_ms']} ms, p99 {data['p99_ms']} ms")
+        if profile['errors']:
+            errors = ', '.join(f"{name}={count}" for name, count in profile['errors'].items())
+            print(f"  • Errores: {errors}")
+
+
+class JSONReporter(Reporter):
+    """Reporte JSON ({'vulnerabilities': [...], 'scan_info': {...}}) escrito
+    de forma incremental: cada hallazgo se vuelca al fichero al producirse y
+    scan_info (con las estadísticas) se escribe al cerrar."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._written = 0
+
+    def start(self, scan_info):
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._file.write('{\n  "vulnerabilities": [')
+        self._file.flush()
+
+    def add(self, finding):
+        text = json.dumps(finding, indent=2, ensure_ascii=False, default=_json_default)
+        self._file.write((',' if self._written else '') + '\n' + textwrap.indent(text, '    '))
+        self._file.flush()
+        self._written += 1
+
+    def close(self, scan_info):
+        text = json.dumps(scan_info, indent=2, ensure_ascii=False, default=_json_default)
+        self._file.write('\n  ],\n  "scan_info": ' + textwrap.indent(text, '  ').lstrip() + '\n}\n')
+        self._file.close()
+
+
+class JSONLReporter(Reporter):
+    """Un hallazgo por línea; la última línea es {"scan_info": {...}}."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def start(self, scan_info):
+        self._file = open(self.path, 'w', encoding='utf-8')
+
+    def add(self, finding):
+        self._file.write(json.dumps(finding, ensure_ascii=False, default=_json_default) + '\n')
+        self._file.flush()
+
+    def close(self, scan_info):
+        self._file.write(json.dumps({'scan_info': scan_info}, ensure_ascii=False, default=_json_default) + '\n')
+        self._file.close()
+
+
+class SARIFReporter(Reporter):
+    """SARIF 2.1.0 en streaming: cabecera y reglas al empezar, un `result` por
+    hallazgo y la invocación con las estadísticas al cerrar."""
+
+    RULES = [
+        {
+            'id': 'html-injection',
+            'name': 'HTMLInjection',
+            'shortDescription': {'text': 'Inyección HTML / XSS reflejado'},
+            'helpUri': 'https://owasp.org/www-community/attacks/xss/',
+        },
+    ]
+    LEVELS = {'basic': 'warning', 'styled': 'warning', 'dangerous': 'error', 'xss': 'error'}
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._written = 0
+
+    def start(self, scan_info):
+        self._file = open(self.path, 'w', encoding='utf-8')
+        driver = {
+            'name': 'htin',
+            'version': __version__,
+            'informationUri': 'https://github.com/polair1/htin',
+            'rules': self.RULES,
+        }
+        header = json.dumps(driver, ensure_ascii=False)
+        self._file.write('{"$schema": "https://json.schemastore.org/sarif-2.1.0.json", "version": "2.1.0", '
+                         '"runs": [{"tool": {"driver": ' + header + '}, "results": [')
+        self._file.flush()
+
+    def add(self, finding):
+        name = finding_input(finding)
+        result = {
+            'ruleId': 'html-injection',
+            'level': self.LEVELS.get(finding.get('level'), 'warning'),
+            'message': {'text': f"{finding.get('reason')}: '{name}' ({finding.get('type')}, nivel {finding.get('level')})"},
+            'locations': [{'physicalLocation': {'artifactLocation': {'uri': finding.get('url', '')}}}],
+            'properties': finding,
+        }
+        self._file.write((',' if self._written else '') + '\n' + json.dumps(result, ensure_ascii=False, default=_json_default))
+        self._file.flush()
+        self._written += 1
+
+    def close(self, scan_info):
+        invocation = {
+            'executionSuccessful': True,
+            'endTimeUtc': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'properties': scan_info,
+        }
+        self._file.write('\n], "invocations": [' + json.dumps(invocation, ensure_ascii=False, default=_json_default) + ']}]}\n')
+        self._file.close()
+
+
+REPORT_FORMATS = {
+    'json': JSONReporter,
+    'jsonl': JSONLReporter,
+    'sarif': SARIFReporter,
+}
+
+
+def make_reporter(path, fmt=None):
+    """Reporter de fichero; sin `fmt` se deduce de la extensión (json por defecto)."""
+    if fmt is None:
+        ext = os.path.splitext(path)[1].lower()
+        fmt = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.sarif': 'sarif'}.get(ext, 'json')
+    return REPORT_FORMATS[fmt](path)
+
+
+# ---------------------------------------------------------------------------
+# Instrumentación (--profile)
+# ---------------------------------------------------------------------------
+
+_timing = threading.local()
+
+
+# respuestas que indican un servidor saturado: se reintentan con backoff
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+def make_retry(retries, backoff=0.5):
+    """Política de reintentos: backoff exponencial con jitter que respeta Retry-After.
+
+    Se reintenta cualquier método (los payloads de formularios van por POST);
+    agotados los reintentos requests lanza RetryError y el test cuenta como fallido.
+    """
+    kwargs = dict(total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+                  allowed_methods=None, respect_retry_after_header=True)
+    try:
+        return urllib3.util.Retry(backoff_jitter=backoff, **kwargs)
+    except TypeError:
+        # urllib3 < 2 no tiene backoff_jitter
+        return urllib3.util.Retry(**kwargs)
+
+
+@functools.lru_cache(maxsize=None)
+def timed_adapter_class():
+    """Define (una vez, al crear la primera sesión) el HTTPAdapter instrumentado.
+
+    Sus conexiones registran en `_timing` el tiempo de DNS + TCP connect (+
+    handshake TLS); las reutilizadas no pasan por connect(). Las clases heredan
+    de urllib3/requests, por eso no se definen al importar el módulo.
+    """
+
+    class TimedHTTPConnection(urllib3.connection.HTTPConnection):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            finally:
+                _timing.connect = getattr(_timing, 'connect', 0.0) + time.perf_counter() - start
+
+    class TimedHTTPSConnection(urllib3.connection.HTTPSConnection):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            finally:
+                _timing.connect = getattr(_timing, 'connect', 0.0) + time.perf_counter() - start
+
+    class TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    class TimedHTTPAdapter(requests.adapters.HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': TimedHTTPConnectionPool,
+                'https': TimedHTTPSConnectionPool,
+            }
+
+    return TimedHTTPAdapter
+
+
+def _percentile(sorted_values, pct):
+    # nearest-rank: el menor valor que deja por debajo al menos el pct% de las muestras
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class ScanProfiler:
+    """Tiempo acumulado por fase, latencias por host y errores por tipo.
+
+    Fases: connect (DNS/connect/TLS), ttfb, download, parse (BeautifulSoup de
+    las páginas rastreadas), analysis, throttle y render (confirmación en
+    navegador, --headless).
+    Las latencias por host se guardan con muestreo de reservorio (como mucho
+    `max_samples` por host) para que la memoria no crezca con el escaneo.
+    """
+
+    PHASES = ('connect', 'ttfb', 'download', 'parse', 'analysis', 'throttle', 'render')
+
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+        self.reset()
+
+    def reset(self):
+        self.phases = {phase: [0.0, 0] for phase in self.PHASES}
+        self.latencies = {}
+        self.requests = collections.Counter()
+        self.errors = collections.Counter()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            entry = self.phases[phase]
+            entry[0] += seconds
+            entry[1] += 1
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def latency(self, host, seconds):
+        with self._lock:
+            self.requests[host] += 1
+            samples = self.latencies.setdefault(host, [])
+            if len(samples) < self.max_samples:
+                samples.append(seconds)
+            else:
+                slot = self._random.randrange(self.requests[host])
+                if slot < self.max_samples:
+                    samples[slot] = seconds
+
+    def error(self, exc):
+        with self._lock:
+            self.errors[type(exc).__name__] += 1
+
+    def take(self):
+        """Devuelve el estado en bruto y lo reinicia (modo batch: un volcado por objetivo)."""
+        with self._lock:
+            state = {
+                'phases': self.phases,
+                'latencies': self.latencies,
+                'requests': dict(self.requests),
+                'errors': dict(self.errors),
+            }
+            self.reset()
+        return state
+
+    def merge(self, state):
+        with self._lock:
+            for phase, (total, count) in state['phases'].items():
+                self.phases[phase][0] += total
+                self.phases[phase][1] += count
+            for host, samples in state['latencies'].items():
+                merged = self.latencies.setdefault(host, [])
+                merged.extend(samples)
+                del merged[self.max_samples:]
+            self.requests.update(state['requests'])
+            self.errors.update(state['errors'])
+
+    def summary(self):
+        with self._lock:
+            phases = {
+                phase: {
+                    'total_s': round(total, 4),
+                    'count': count,
+                    'avg_ms': round(total / count * 1000, 2) if count else 0.0,
+                }
+                for phase, (total, count) in self.phases.items()
+            }
+            hosts = {}
+            for host, samples in self.latencies.items():
+                ordered = sorted(samples)
+                hosts[host] = {
+                    'requests': self.requests[host],
+                    'p50_ms': round(_percentile(ordered, 50) * 1000, 2),
+                    'p95_ms': round(_percentile(ordered, 95) * 1000, 2),
+                    'p99_ms': round(_percentile(ordered, 99) * 1000, 2),
+                    'max_ms': round(ordered[-1] * 1000, 2),
+                }
+            return {'phases': phases, 'hosts': hosts, 'errors': dict(self.errors)}
+
+
+# ---------------------------------------------------------------------------
+# Confirmación en navegador (--headless)
+#
+# La detección es textual: dice que el payload volvió sin escapar, no que el
+# navegador lo convierta en elementos o lo ejecute. Con --headless cada
+# hallazgo candidato se renderiza en Chromium (Playwright, opcional) y se anota
+# con su veredicto. Solo se renderizan hallazgos, nunca todas las respuestas.
+# ---------------------------------------------------------------------------
+
+HEADLESS_VERDICTS = {
+    'executed': 'ejecutado',
+    'rendered': 'renderizado como HTML',
+    'not_rendered': 'mostrado como texto (probable falso positivo)',
+}
+PAYLOAD_TAG_RE = re.compile(r'<\s*([a-zA-Z][\w-]*)')
+# ¿hay un elemento <tag> que lleve el marcador en un atributo o en su propio
+# texto? Si el texto/atributo contiene '<', el payload llegó escapado (como texto)
+RENDER_CHECK_JS = """
+([marker, tag]) => {
+  const own = (value) => value.includes(marker) && !value.includes('<');
+  for (const el of document.querySelectorAll(tag || '*')) {
+    for (const attr of el.attributes) {
+      if (own(attr.value)) return true;
+    }
+    for (const node of el.childNodes) {
+      if (node.nodeType === Node.TEXT_NODE && own(node.data)) return true;
+    }
+  }
+  return false;
+}
+"""
+
+
+class HeadlessPool:
+    """Chromium headless con `size` pestañas reutilizadas para confirmar hallazgos.
+
+    Playwright es una dependencia opcional (pip install playwright && playwright
+    install chromium). El navegador se lanza en el primer confirm(); si no se
+    puede, `error` explica por qué y confirm() devuelve None (el escaneo sigue
+    con la detección textual).
+
+    Playwright corre en un hilo propio con su bucle asyncio. confirm() se puede
+    llamar desde cualquier hilo y espera al veredicto: con el motor concurrente
+    se renderizan hasta `size` candidatos a la vez. Cada pestaña sirve el cuerpo
+    ya descargado en la URL del hallazgo (no se vuelve a pedir al servidor) y
+    bloquea el resto de peticiones (imágenes, scripts externos...). Como mucho
+    se renderizan `max_renders` hallazgos por escaneo (reset() al empezar cada uno).
+
+    Veredictos: 'executed' (el payload abrió un diálogo o escribió el marcador
+    en la consola), 'rendered' (creó elementos con el marcador) o 'not_rendered'
+    (el navegador lo muestra como texto: probable falso positivo).
+    """
+
+    def __init__(self, size=2, max_renders=50, timeout=10):
+        self.size = max(1, int(size))
+        self.max_renders = max_renders
+        self.timeout = timeout
+        self.renders = 0
+        self.error = None
+        self._lock = threading.Lock()
+        self._loop = None
+        self._playwright = None
+        self._browser = None
+        self._tabs = None
+
+    def reset(self):
+        """Reinicia el cupo de `max_renders` (el navegador sigue abierto)."""
+        with self._lock:
+            self.renders = 0
+
+    @staticmethod
+    def payload_tag(payload):
+        match = PAYLOAD_TAG_RE.search(payload or '')
+        return match.group(1).lower() if match else None
+
+    def _started(self):
+        if self._loop is not None:
+            return True
+        if self.error is not None:
+            return False
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name='htin-headless', daemon=True).start()
+        try:
+            asyncio.run_coroutine_threadsafe(self._launch(), loop).result(60)
+        except ImportError:
+            self.error = 'Playwright no está instalado (pip install playwright && playwright install chromium)'
+        except Exception as e:
+            detail = str(e).strip().splitlines() or [type(e).__name__]
+            self.error = f"no se pudo lanzar Chromium: {detail[0]}"
+        if self.error is not None:
+            self._stop(loop)
+            return False
+        self._loop = loop
+        atexit.register(self.close)
+        return True
+
+    async def _launch(self):
+        from playwright.async_api import async_playwright
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        self._tabs = asyncio.Queue()
+        for _ in range(self.size):
+            self._tabs.put_nowait(await self._open_tab())
+
+    async def _open_tab(self):
+        context = await self._browser.new_context()
+        page = await context.new_page()
+        tab = {'page': page, 'body': None, 'marker': None, 'events': []}
+
+        async def route(route):
+            request = route.request
+            if tab['body'] is not None and request.is_navigation_request() and request.frame == page.main_frame:
+                body, tab['body'] = tab['body'], None
+                await route.fulfill(status=200, content_type='text/html; charset=utf-8', body=body)
+            else:
+                await route.abort()
+
+        async def on_dialog(dialog):
+            tab['events'].append('dialog')
+            await dialog.dismiss()
+
+        def on_console(message):
+            if tab['marker'] and tab['marker'] in message.text:
+                tab['events'].append('console')
+
+        await page.route('**/*', route)
+        page.on('dialog', on_dialog)
+        page.on('console', on_console)
+        return tab
+
+    async def _render(self, url, body, marker, tag):
+        tab = await self._tabs.get()
+        tab.update(body=body, marker=marker, events=[])
+        try:
+            await tab['page'].goto(url, wait_until='load', timeout=self.timeout * 1000)
+            if tab['events']:
+                return 'executed'
+            rendered = await tab['page'].evaluate(RENDER_CHECK_JS, [marker, tag])
+            return 'rendered' if rendered else 'not_rendered'
+        finally:
+            tab.update(body=None, marker=None)
+            self._tabs.put_nowait(tab)
+
+    def confirm(self, url, body, marker, payload):
+        """Veredicto del navegador para un hallazgo, o None si no hay navegador,
+        se agotó `max_renders` o el render falló."""
+        with self._lock:
+            if self.renders >= self.max_renders or not self._started():
+                return None
+            self.renders += 1
+        future = asyncio.run_coroutine_threadsafe(
+            self._render(url, body, marker, self.payload_tag(payload)), self._loop)
+        try:
+            return future.result(self.timeout + 5)
+        except Exception:
+            future.cancel()
+            return None
+
+    async def _shutdown(self):
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._browser = self._playwright = None
+
+    def _stop(self, loop):
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(10)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+
+    def close(self):
+        loop, self._loop = self._loop, None
+        if loop is not None:
+            self._stop(loop)
+
+
 class HTMLInjectionScanner:
-    def __init__(self, timeout=15, verbose=False, delay=0.5):
+    def __init__(self, timeout=15, verbose=False, delay=0.5, batch=False, baseline_cache=256,
+                 stream=False, max_body=2 * 1024 * 1024, journal=None, resume=False, profile=False,
+                 adaptive=False, retries=3, auto_rate=False, cache=None, incremental=False,
+                 payload_files=None, encodings=(), inject_headers=(), inject_cookies=None,
+                 inject_path=False, json_body=None, stored=False, sweep_urls=(), headless=False,
+                 headless_workers=2, headless_max=50):
         self.timeout = timeout
         self.verbose = verbose
         self.delay = delay
+        # stream: leer respuestas por bloques, con tope max_body y parada temprana
+        self.stream = stream
+        self.max_body = max_body
+        # batch: un marcador distinto por campo/parámetro en una sola petición
+        self.batch = batch
+        # adaptive: sonda inofensiva primero y solo los payloads que encajan en su contexto
+        self.adaptive = adaptive
+        # puntos de inyección además de formularios y query: cabeceras, cookies
+        # (None = no, [] = las de la sesión), segmentos de ruta y cuerpo JSON
+        self.inject_headers = list(inject_headers or ())
+        self.inject_cookies = list(inject_cookies) if inject_cookies is not None else None
+        self.inject_path = inject_path
+        self.json_body = json_body
+        # stored: índice de marcadores enviados y barrido de páginas al terminar
+        self.stored = stored
+        self.sweep_urls = list(sweep_urls or ())
+        self._sent = {}
+        self._pages = []
+        # 48 bits: sin colisiones entre ejecuciones ni entre procesos de --targets
+        # (con --stored, payloads de escaneos anteriores siguen en el objetivo)
+        self._marker_prefix = os.urandom(6).hex()
+        self._marker_ids = itertools.count()
+        # headless: confirmar los hallazgos renderizándolos en Chromium (Playwright)
+        self.headless = HeadlessPool(headless_workers, headless_max, timeout) if headless else None
+        # respuestas base para el análisis diferencial (0 = desactivado)
+        self.baseline_cache = BaselineCache(baseline_cache) if baseline_cache else None
+        # diario de tests completados/hallazgos para reanudar escaneos (--journal/--resume)
+        self.journal = ScanJournal(journal, resume=resume) if journal else None
+        # caché entre ejecuciones (--cache); con incremental se reutilizan sus veredictos
+        self.cache = ScanCache(cache) if cache else None
+        self.incremental = incremental and self.cache is not None
+        self._cache_lock = threading.Lock()
+        self._scan_levels = ()
+        self._endpoints = {}
+        self._reused = []
+        self.target = None
+        # reintentos con backoff y tasa por host que baja si el servidor se satura
+        # (y con auto_rate también sube por encima de --delay/--rps si va holgado)
+        self.retries = retries
+        self.auto_rate = auto_rate
+        self._rates = {}
+        self._rates_lock = threading.Lock()
 
         self.session = requests.Session()
+        self._mount_adapter(self._make_adapter())
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         })
@@ -85,13 +1749,39 @@ class HTMLInjectionScanner:
                 '<svg/onload=alert(1)>{marker}</svg>',
             ]
         }
+        # compilados una vez (+ ficheros de --payload-file en el nivel 'custom')
+        self.payload_set = PayloadSet(self.payloads, encodings=encodings)
+        for path in payload_files or ():
+            self.payload_set.load(path)
 
         self.stats = {
             'total_tested': 0,
             'vulnerabilities_found': 0,
             'forms_tested': 0,
-            'params_tested': 0
+            'params_tested': 0,
+            'baseline_requests': 0,
+            'skipped_non_html': 0,
+            'truncated_bodies': 0,
+            'pages_crawled': 0,
+            'duplicates_skipped': 0,
+            'tests_skipped': 0,
+            'inputs_skipped': 0,
+            'failed_tests': 0,
+            'retries': 0,
+            'pages_unchanged': 0,
+            'endpoints_reused': 0,
+            'pages_swept': 0,
+            'headless_rendered': 0,
+            'headless_confirmed': 0
         }
+        self._stats_lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._report_lock = threading.Lock()
+        self.reporters = []
+        self._scan_info = None
+        # tiempos por fase, latencias y errores; --profile los incluye en el reporte
+        self.profiler = ScanProfiler()
+        self.profile = profile
 
     def log(self, message, level='info'):
         prefix = {
@@ -101,112 +1791,146 @@ class HTMLInjectionScanner:
             'error': f'{Colors.RED}[✗]{Colors.END}',
             'vuln': f'{Colors.RED}{Colors.BOLD}[!]{Colors.END}',
         }
-        print(f"{prefix.get(level, '[*]')} {message}")
+        # una sola escritura por línea para no mezclar salidas de hilos/procesos
+        with self._log_lock:
+            print(f"{prefix.get(level, '[*]')} {message}\n", end='')
 
     def make_marker(self):
-        return f"__htin_{uuid.uuid4().hex[:6]}__"
-
-    def is_vulnerable(self, original_response, injected_response, marker=None):
-        
-        raw = injected_response or ''
-        unescaped = html.unescape(raw)
-
-        # 1) Buscar marcador en raw o en unescaped
-        if marker:
-            if marker in raw or marker in unescaped:
-                return True, 'Payload reflejado (raw/unescaped) con marcador'
-
-        # 2) Buscar etiquetas peligrosas en el DOM (más probable que signifique que HTML fue interpretado)
-        try:
-            soup = BeautifulSoup(unescaped, 'html.parser')
-            dangerous_tags = ['script', 'iframe', 'img', 'svg', 'object', 'embed']
-            for tag in dangerous_tags:
-                elems = soup.find_all(tag)
-                if elems:
-                    # si encontramos tags, ver si contienen el marker en su contenido o atributos
-                    for e in elems:
-                        text_and_attrs = str(e)
-                        if marker and marker in text_and_attrs:
-                            return True, f"Etiqueta <{tag}> inyectada detectada en DOM con marcador"
-                    # si no hay marcador pero hay tags sospechosas, considerarlo potencial vulnerabilidad
-                    return True, f"Etiqueta <{tag}> inyectada detectada en DOM"
-        except Exception:
-            pass
-
-        # 3) Heurística final: buscar una porción significativa del payload en el HTML
-        try:
-            # quita el marker para evitar patrones vacíos
-            if marker:
-                pattern = re.escape(marker)
-                if len(pattern) > 4 and re.search(pattern, unescaped, re.IGNORECASE):
-                    return True, 'Marcador detectado via regex'
-        except Exception:
-            pass
-
-        return False, 'No vulnerable'
-
-    def test_url_parameter(self, url, param, payload_levels=['basic', 'styled']):
-        vulnerabilities = []
-        parsed = urlsplit(url)
-        qs = parse_qs(parsed.query)
-
-        # si el parámetro no existe, lo añadimos (esto prueba casos de reflejo incluso sin parámetro)
-        if param not in qs:
-            qs[param] = ['']
-
-        for level in payload_levels:
-            if level not in self.payloads:
-                continue
-
-            for payload_template in self.payloads[level]:
-                marker = self.make_marker()
-                payload = payload_template.format(marker=marker)
-
-                qs_copy = {k: v[:] for k, v in qs.items()}
-                qs_copy[param] = [payload]
-                new_query = urlencode(qs_copy, doseq=True)
-                new_url = urlunsplit((parsed.scheme, parsed.netloc, parsed.path, new_query, parsed.fragment))
-
-                try:
-                    response = self.session.get(new_url, timeout=self.timeout)
-                    self.stats['total_tested'] += 1
-                    self.stats['params_tested'] += 1
-
-                    vulnerable, reason = self.is_vulnerable('', response.text, marker=marker)
-
-                    if vulnerable:
-                        self.log(f"Vulnerable: Parámetro '{param}' con payload nivel {level}", 'vuln')
-                        vulnerabilities.append({
-                            'type': 'url_parameter',
-                            'parameter': param,
-                            'payload': payload,
-                            'marker': marker,
-                            'reason': reason,
-                            'level': level,
-                            'url': response.url
-                        })
-                        self.stats['vulnerabilities_found'] += 1
-                    elif self.verbose:
-                        self.log(f"  Payload {level} probado y bloqueado/reflejado sin marcador", 'info')
-
-                    time.sleep(self.delay)
-
-                except requests.exceptions.RequestException as e:
-                    if self.verbose:
-                        self.log(f"Error de red: {str(e)}", 'error')
-                except Exception as e:
-                    if self.verbose:
-                        self.log(f"Error inesperado: {str(e)}", 'error')
-
-        return vulnerabilities
+        # prefijo aleatorio por scanner + contador: sin colisiones dentro del
+        # escaneo (los 24 bits aleatorios de antes chocaban a partir de miles
+        # de tests) y sin llamar al generador aleatorio por cada payload
+        return f"__htin_{self._marker_prefix}{next(self._marker_ids):02x}__"
+
+    def analyze(self, body, marker=None, payload=None, baseline=None):
+        """Analiza una respuesta (bytes o str) en busca del payload inyectado.
+
+        Devuelve (vulnerable, razón, contexto). El contexto es el de la primera
+        reflexión del marcador (ver classify_context) o None si no se reflejó.
+        `baseline` es la tag_signature de la respuesta sin inyectar: si se da,
+        solo cuentan las etiquetas peligrosas que no estaban ya en la página.
+        """
+        raw = _as_bytes(body)
+        marker_b = marker.encode('ascii') if marker else None
+
+        # 1) Buscar el marcador en los bytes tal cual
+        if marker_b:
+            pos = raw.find(marker_b)
+            if pos != -1:
+                context, window = reflection_context(raw, pos, len(marker_b))
+                if payload and payload in window:
+                    return True, 'Payload reflejado sin escapar con marcador', context
+                return True, 'Payload reflejado (raw/unescaped) con marcador', context
+
+            # 1b) Marcador codificado con entidades: se desescapa solo la ventana
+            for hint in ENCODED_MARKER_HINT_RE.finditer(raw):
+                start = max(0, hint.start() - 64)
+                unescaped = html.unescape(raw[start:hint.end() + 128].decode('utf-8', errors='replace'))
+                if marker in unescaped:
+                    context, _ = reflection_context(raw, hint.start(), len(marker_b))
+                    return True, 'Payload reflejado (raw/unescaped) con marcador', context
+
+        # 2) Buscar etiquetas peligrosas (literales o codificadas)
+        if baseline is not None:
+            new_tags = tag_signature(raw) - baseline
+            if new_tags:
+                tag, attrs = next(iter(new_tags))
+                detail = f" ({', '.join(attrs)})" if attrs else ''
+                return True, f"Etiqueta <{tag}>{detail} nueva respecto a la respuesta base", None
+        else:
+            tag = DANGEROUS_TAG_RE.search(raw)
+            if tag:
+                return True, f"Etiqueta <{tag.group(1).decode().lower()}> inyectada detectada en DOM", None
 
-    def test_form(self, url, form, payload_levels=['basic', 'styled']):
-        vulnerabilities = []
+        # 3) Heurística final: marcador con otra capitalización
+        if marker_b and len(marker_b) > 4:
+            if re.search(re.escape(marker_b), raw, re.IGNORECASE):
+                return True, 'Marcador detectado via regex', None
 
-        action = form.get('action', '')
-        method = form.get('method', 'get').lower()
-        target_url = urljoin(url, action)
+        return False, 'No vulnerable', None
 
+    def is_vulnerable(self, original_response, injected_response, marker=None):
+        baseline = tag_signature(original_response) if original_response else None
+        vulnerable, reason, _ = self.analyze(injected_response, marker=marker, baseline=baseline)
+        return vulnerable, reason
+
+    def _baseline_key(self, request):
+        parsed = urlsplit(request['url'])
+        names = set(parse_qs(parsed.query, keep_blank_values=True))
+        names.update(request['params'] or ())
+        names.update(request['data'] or ())
+        if isinstance(request.get('json'), dict):
+            names.update(request['json'])
+        return (request['method'], urlunsplit((parsed.scheme, parsed.netloc, parsed.path, '', '')), frozenset(names))
+
+    def _baseline(self, job):
+        """Huella de la respuesta sin inyectar para este job (cacheada en LRU)."""
+        request = job.get('baseline')
+        if self.baseline_cache is None or request is None:
+            return None
+
+        def fetch():
+            # petición extra al mismo host: respeta --delay/--rps como las demás
+            self._pace(request['url'])
+            try:
+                response = self._send(request)
+            except Exception as e:
+                self._log_request_error(e)
+                return None
+            self._count('baseline_requests')
+            body = self._read_body(response)
+            with self.profiler.phase('analysis'):
+                return tag_signature(body)
+
+        return self.baseline_cache.get_or_compute(self._baseline_key(request), fetch)
+
+    def _make_adapter(self, pool_size=10):
+        return timed_adapter_class()(pool_connections=pool_size, pool_maxsize=pool_size,
+                                     max_retries=make_retry(self.retries))
+
+    def _base_rate(self):
+        return 1.0 / self.delay if self.delay and self.delay > 0 else 0
+
+    def _rate(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._rates_lock:
+            rate = self._rates.get(host)
+            if rate is None:
+                base = self._base_rate()
+                ceiling = base * 4 if self.auto_rate and base else None
+                rate = self._rates[host] = AdaptiveRate(base, ceiling=ceiling)
+            return rate
+
+    def _observe(self, url, latency=None, ok=True):
+        controller = self._rate(url)
+        before = controller.rate
+        rate = controller.observe(latency, ok)
+        if rate != before:
+            self._rate_changed(url, rate)
+            if self.verbose and (before is None or (rate is not None and rate < before)):
+                self.log(f"Servidor lento o saturado: bajando a {rate:.2f} peticiones/s", 'warning')
+
+    def _rate_changed(self, url, rate):
+        pass
+
+    def _delay_for(self, url):
+        rate = self._rate(url).rate
+        return 1.0 / rate if rate else 0
+
+    def _mount_adapter(self, adapter):
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+            self.profiler.add('throttle', seconds)
+
+    def _count(self, key, n=1):
+        # los motores concurrentes actualizan las estadísticas desde varios hilos
+        with self._stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + n
+
+    def _extract_form_fields(self, form):
         # Extraer campos de entrada
         inputs = form.find_all('input')
         textareas = form.find_all('textarea')
@@ -241,164 +1965,1200 @@ class HTMLInjectionScanner:
                 else:
                     fields.append(name)
 
+        return fields, hidden_fields
+
+    def _iter_templates(self, payload_levels):
+        return self.payload_set.iter(payload_levels)
+
+    def _query_params(self, url, params):
+        qs = parse_qs(urlsplit(url).query)
+        # si el parámetro no existe, lo añadimos (esto prueba casos de reflejo incluso sin parámetro)
+        for param in params:
+            if param not in qs:
+                qs[param] = ['']
+        return qs
+
+    def _query_point(self, url, params):
+        return QueryPoint(url, self._query_params(url, params), params)
+
+    def _payload_fields(self, level, payload, marker):
+        fields = {'payload': payload.render(marker), 'marker': marker, 'level': level, 'template': payload}
+        if payload.encoding != 'raw':
+            fields['decoded'] = payload.decoded(marker)
+        return fields
+
+    def _point_job(self, point, name, level, payload):
+        # Cada "job" describe una única petición con un payload inyectado
+        marker = self.make_marker()
+        job = {'type': point.type, 'input': name}
+        job.update(point.request(payload, {name: marker}))
+        job.update(self._payload_fields(level, payload, marker))
+        job['target'] = point.target
+        job['baseline'] = point.baseline()
+        return job
+
+    def _point_jobs(self, point, payload_levels):
+        # generadores: los jobs se crean según se envían, no todos de antemano
+        return (self._point_job(point, name, level, payload)
+                for name in point.names
+                for level, payload in self._iter_templates(payload_levels))
+
+    def _point_batch_job(self, point, names, level, payload):
+        # Modo agrupado: un marcador distinto en cada entrada de la misma petición
+        markers = {name: self.make_marker() for name in names}
+        job = {'type': point.type, 'input': ', '.join(names)}
+        job.update(point.request(payload, markers))
+        job.update({
+            'batch': {marker: (name, payload.render(marker)) for name, marker in markers.items()},
+            'confirm': functools.partial(self._point_job, point),
+            'level': level,
+            'template': payload,
+            'target': point.target,
+        })
+        return job
+
+    def _point_batch_jobs(self, point, payload_levels):
+        return (self._point_batch_job(point, point.names, level, payload)
+                for level, payload in self._iter_templates(payload_levels))
+
+    def _point_probe_jobs(self, point, payload_levels):
+        # --adaptive: una sonda por entrada (o una para todas en modo agrupado)
+        jobs = []
+        for group in ([point.names] if self.batch else [[name] for name in point.names]):
+            job = self._point_batch_job(point, group, 'probe', PROBE_PAYLOAD)
+            job.update({'probe': True, 'levels': payload_levels})
+            jobs.append(job)
+        return jobs
+
+    def _point_job_list(self, point, payload_levels):
+        """Jobs de todas las entradas de un punto de inyección, según el modo:
+        sondas (--adaptive), peticiones agrupadas (--batch) o uno por payload."""
+        if not point.names:
+            return []
+        if self.adaptive:
+            return self._point_probe_jobs(point, payload_levels)
+        if self.batch:
+            return self._point_batch_jobs(point, payload_levels)
+        return self._point_jobs(point, payload_levels)
+
+    def _param_job_list(self, url, params, payload_levels):
+        return self._point_job_list(self._query_point(url, params), payload_levels)
+
+    def _form_target(self, url, form):
+        action = form.get('action', '')
+        method = 'POST' if form.get('method', 'get').lower() == 'post' else 'GET'
+        target_url = urljoin(url, action)
+
+        fields, hidden_fields = self._extract_form_fields(form)
+
         if not fields:
             if self.verbose:
                 self.log("No se encontraron campos testables en este formulario", 'warning')
-            return []
+        else:
+            self.log(f"Campos a probar: {', '.join(fields)}", 'info')
 
-        self.log(f"Campos a probar: {', '.join(fields)}", 'info')
+        return target_url, method, fields, hidden_fields
 
-        # Probar cada campo
+    def _form_base_data(self, fields, hidden_fields):
+        # como un navegador: se envían todos los campos, los no inyectados vacíos
+        data = hidden_fields.copy()
         for field in fields:
-            for level in payload_levels:
-                if level not in self.payloads:
-                    continue
+            data.setdefault(field, '')
+        return data
+
+    def _form_point(self, url, form):
+        target_url, method, fields, hidden_fields = self._form_target(url, form)
+        return FormPoint(target_url, method, self._form_base_data(fields, hidden_fields), fields)
+
+    def _form_job_list(self, url, form, payload_levels):
+        return self._point_job_list(self._form_point(url, form), payload_levels)
+
+    def _extra_points(self, url):
+        """Puntos de inyección adicionales de una página (--inject-headers,
+        --inject-cookies, --inject-path, --json-body)."""
+        points = []
+        if self.inject_headers:
+            points.append(HeaderPoint(url, self.inject_headers))
+        if self.inject_cookies is not None:
+            # sin nombres: las cookies de la sesión que el navegador enviaría a esta URL
+            cookies = self._session_cookies(url)
+            for name in self.inject_cookies:
+                cookies.setdefault(name, '')
+            points.append(CookiePoint(url, cookies, self.inject_cookies or None))
+        if self.inject_path:
+            points.append(PathPoint(url))
+        if self.json_body is not None:
+            points.append(JSONPoint(url, self.json_body))
+        return [point for point in points if point.names]
+
+    def _session_cookies(self, url):
+        """Cookies del jar de la sesión que corresponden a `url` (dominio, ruta,
+        secure), como las enviaría requests. La sesión se reutiliza entre
+        objetivos (--targets, --serve): las de otros hosts no deben salir."""
+        prepared = requests.Request('GET', url).prepare()
+        header = requests.cookies.get_cookie_header(self.session.cookies, prepared) or ''
+        cookies = {}
+        for part in header.split('; '):
+            name, sep, value = part.partition('=')
+            if sep:
+                cookies[name] = value
+        return cookies
+
+    def _send(self, job):
+        _timing.connect = 0.0
+        try:
+            response = self.session.request(
+                job['method'], job['url'],
+                params=job['params'], data=job['data'], headers=job.get('headers'), json=job.get('json'),
+                # siempre stream=True: el cuerpo se lee en _read_body, dentro de la
+                # fase download (sin él requests lo descarga aquí, antes de medir)
+                timeout=self.timeout, stream=True,
+            )
+        except requests.exceptions.RequestException:
+            self._observe(job['url'], ok=False)
+            raise
+        retries = getattr(response.raw, 'retries', None)
+        if retries is not None and retries.history:
+            # hubo 429/5xx o errores de red antes de esta respuesta
+            self._count('retries', len(retries.history))
+            self._observe(job['url'], ok=False)
+        else:
+            self._observe(job['url'], response.elapsed.total_seconds())
+        # elapsed = hasta recibir las cabeceras (incluye la conexión si fue nueva)
+        connect = _timing.connect
+        if connect:
+            self.profiler.add('connect', connect)
+        self.profiler.add('ttfb', max(0.0, response.elapsed.total_seconds() - connect))
+        return response
+
+    def _read_body(self, response, marker=None):
+        """Devuelve el cuerpo de la respuesta en bytes.
+
+        En modo streaming se lee por bloques: las respuestas que no son HTML se
+        descartan sin descargarlas, el cuerpo se corta en `max_body` bytes y, si
+        se da `marker`, se deja de leer en cuanto aparece (más una ventana de
+        contexto). Entre bloques se conserva un solapamiento para no perder un
+        marcador partido en dos.
+        """
+        start = time.perf_counter()
+        try:
+            body = self._download(response, marker)
+        finally:
+            download = time.perf_counter() - start
+            self.profiler.add('download', download)
+            self.profiler.latency(urlsplit(response.url).netloc, response.elapsed.total_seconds() + download)
+        return body
+
+    def _download(self, response, marker=None):
+        if not self.stream:
+            # lee el cuerpo completo y devuelve la conexión al pool
+            return response.content
+
+        try:
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            if content_type and content_type not in HTML_CONTENT_TYPES:
+                self._count('skipped_non_html')
+                return b''
+
+            needle = marker.encode('ascii') if marker else None
+            overlap = len(needle) - 1 if needle else 0
+            body = bytearray()
+            stop_at = self.max_body
+            for chunk in response.iter_content(STREAM_CHUNK):
+                searched_from = max(0, len(body) - overlap)
+                body += chunk
+                if needle and stop_at == self.max_body:
+                    pos = body.find(needle, searched_from)
+                    if pos != -1:
+                        # marcador encontrado: basta con la ventana de contexto posterior
+                        stop_at = min(self.max_body, pos + len(needle) + CONTEXT_WINDOW)
+                if len(body) >= stop_at:
+                    if stop_at == self.max_body:
+                        self._count('truncated_bodies')
+                    del body[stop_at:]
+                    break
+            return bytes(body)
+        finally:
+            response.close()
+
+    def _make_finding(self, job, response, reason, context=None):
+        finding = self._base_finding(job, response, reason, context)
+        if 'decoded' in job:
+            finding['encoding'] = job['template'].encoding
+        return finding
+
+    def _base_finding(self, job, response, reason, context):
+        if job['type'] == 'url_parameter':
+            method, url = None, response.url
+        else:
+            method, url = job['method'], job['url']
+        return Finding(job['type'], job['input'], job['payload'], job['marker'], reason, context,
+                       job['level'], method, url)
+
+    def _confirm_render(self, finding, body, payload, url=None):
+        """--headless: renderiza el hallazgo y anota en 'headless' si el payload
+        se ejecutó, creó elementos o quedó como texto (ver HeadlessPool)."""
+        pool = self.headless
+        if pool is None:
+            return
+        with self.profiler.phase('render'):
+            verdict = pool.confirm(url or finding['url'], body, finding['marker'], payload)
+        if verdict is None:
+            if pool.error is not None:
+                with self._stats_lock:
+                    disabled, self.headless = self.headless is pool, None
+                if disabled:
+                    self.log(f"--headless desactivado, {pool.error}. Se sigue solo con la detección textual", 'warning')
+            return
+        finding['headless'] = verdict
+        self._count('headless_rendered')
+        if verdict != 'not_rendered':
+            self._count('headless_confirmed')
+        if self.verbose:
+            self.log(f"  Navegador: {HEADLESS_VERDICTS[verdict]}", 'info')
+
+    def _job_key(self, job):
+        # identidad estable de un test: no incluye el marcador (aleatorio en cada ejecución)
+        return '|'.join((job['type'], job['method'], job['target'], job['input'], job['level'], job['template'].key))
+
+    def _skip(self, job):
+        """True si el diario indica que este test ya se completó (--resume)."""
+        if self.journal is None or job.get('batch') or not self.journal.is_done(self._job_key(job)):
+            return False
+        self._count('tests_skipped')
+        # sus hallazgos están en el diario, no en este escaneo: sin veredicto para la caché
+        self._track(job, failed=True)
+        return True
+
+    def _track(self, job, finding=None, failed=False):
+        """Acumula el veredicto de la entrada (formulario/parámetros) del job."""
+        key = job.get('endpoint')
+        if key is None:
+            return
+        with self._cache_lock:
+            state = self._endpoints.setdefault(key, {'findings': [], 'complete': True})
+            if finding is not None:
+                state['findings'].append(finding)
+            if failed:
+                state['complete'] = False
+
+    def _finish_job(self, job, finding=None):
+        if self.journal is None:
+            return
+        if finding is not None:
+            record = dict(finding)
+            if self.target:
+                record['target'] = self.target
+            self.journal.record_finding(record)
+        self.journal.record_test(self._job_key(job))
+
+    def _index_marker(self, job, marker, name):
+        self._sent[marker] = SentMarker(job['type'], name, job['method'], job['target'],
+                                        job['template'], job['level'], time.time())
+
+    def _execute_job(self, job):
+        """Envía la petición de un job y devuelve el hallazgo (o None)."""
+        if self.stored:
+            self._index_marker(job, job['marker'], job['input'])
+        try:
+            response = self._send(job)
+            self._count('total_tested')
+            if job['type'] == 'url_parameter':
+                self._count('params_tested')
+
+            body = self._read_body(response, job['marker'])
+            baseline = self._baseline(job)
+            with self.profiler.phase('analysis'):
+                vulnerable, reason, context = self.analyze(body, marker=job['marker'],
+                                                           payload=job.get('decoded', job['payload']),
+                                                           baseline=baseline)
+                if vulnerable and 'decoded' in job and job['decoded'].encode('utf-8') not in _as_bytes(body):
+                    # variante codificada: solo cuenta si la aplicación la decodificó
+                    vulnerable = False
+
+            if vulnerable:
+                _, label = INPUT_TYPES[job['type']]
+                self.log(f"Vulnerable: {label} '{job['input']}' con payload nivel {job['level']}", 'vuln')
+                self._count('vulnerabilities_found')
+                if self.verbose:
+                    self.log(f"  Payload: {job['payload'][:80]}", 'info')
+                finding = self._make_finding(job, response, reason, context)
+                self._confirm_render(finding, body, job.get('decoded', job['payload']))
+                self._track(job, finding)
+                self._finish_job(job, finding)
+                self.report_finding(finding)
+                return finding
 
-                for payload_template in self.payloads[level]:
-                    marker = self.make_marker()
-                    payload = payload_template.format(marker=marker)
+            if self.verbose:
+                self.log(f"  Payload {job['level']} probado y bloqueado/reflejado sin marcador", 'info')
+            self._finish_job(job)
 
-                    try:
-                        data = hidden_fields.copy()
-                        data[field] = payload
+        except Exception as e:
+            self._count('failed_tests')
+            self._track(job, failed=True)
+            self._log_request_error(e)
+
+        return None
+
+    def _log_request_error(self, e):
+        self.profiler.error(e)
+        if self.verbose:
+            if isinstance(e, requests.exceptions.RequestException):
+                self.log(f"Error de red: {str(e)}", 'error')
+            else:
+                self.log(f"Error inesperado: {str(e)}", 'error')
+
+    def _execute_batch_job(self, job):
+        """Envía una petición agrupada (o una sonda de --adaptive) y devuelve
+        los jobs de seguimiento de cada entrada cuyo marcador se reflejó."""
+        key = self._job_key(job)
+        if self.journal is not None and self.journal.is_done(key):
+            # ya enviada en una ejecución anterior: solo quedan sus confirmaciones
+            self._count('tests_skipped')
+            return self._follow_ups(job, self.journal.reflected(key))
+
+        if self.stored and not job.get('probe'):
+            for marker, (name, _) in job['batch'].items():
+                self._index_marker(job, marker, name)
+        try:
+            response = self._send(job)
+            self._count('total_tested')
+            if job['type'] == 'url_parameter':
+                self._count('params_tested')
+            body = self._read_body(response)
+            with self.profiler.phase('analysis'):
+                if job.get('probe'):
+                    reflected = self._probe_reflections(job, body)
+                else:
+                    reflected = self._batch_reflections(job, body)
+        except Exception as e:
+            self._count('failed_tests')
+            self._track(job, failed=True)
+            self._log_request_error(e)
+            return []
 
-                        if method == 'post':
-                            response = self.session.post(target_url, data=data, timeout=self.timeout)
-                        else:
-                            response = self.session.get(target_url, params=data, timeout=self.timeout)
+        if self.journal is not None:
+            self.journal.record_test(key, reflected)
+        return self._follow_ups(job, reflected)
 
-                        self.stats['total_tested'] += 1
+    def _batch_reflections(self, job, body):
+        """Entradas cuyo marcador aparece en la respuesta agrupada."""
+        hits = MarkerMatcher(job['batch']).find_all(body)
+        reflected = []
+        for marker in sorted(hits, key=hits.get):
+            name, _ = job['batch'][marker]
+            if self.verbose:
+                self.log(f"  '{name}' reflejado en petición agrupada ({job['level']}), confirmando", 'info')
+            reflected.append(name)
+        return reflected
+
+    def _probe_reflections(self, job, body):
+        """[entrada, contextos] de cada entrada de la sonda que se refleja en un
+        contexto del que se puede salir; el resto se omite. Con --stored las que
+        no se reflejan se prueban igualmente en contexto de texto: pueden
+        aparecer en otra página (el barrido busca sus marcadores)."""
+        raw = _as_bytes(body)
+        positions = collections.defaultdict(list)
+        for marker, pos in MarkerMatcher(job['batch']).finditer(raw):
+            positions[marker].append(pos)
+
+        reflected = []
+        for marker, (name, _) in job['batch'].items():
+            if self.stored and not positions[marker]:
+                if self.verbose:
+                    self.log(f"  '{name}' no reflejado: se prueba igualmente (--stored)", 'info')
+                reflected.append([name, ['text']])
+                continue
+            contexts = {probe_context(raw, pos, len(marker)) for pos in positions[marker][:PROBE_MAX_HITS]}
+            contexts.discard(None)
+            if not contexts:
+                self._count('inputs_skipped')
+                if self.verbose:
+                    state = 'escapado' if positions[marker] else 'no reflejado'
+                    self.log(f"  '{name}' {state}: se omite", 'info')
+                continue
+            contexts = sorted(contexts)
+            if self.verbose:
+                self.log(f"  '{name}' reflejado en contexto {', '.join(contexts)}", 'info')
+            reflected.append([name, contexts])
+        return reflected
+
+    def _adapted_templates(self, payload_levels, contexts):
+        # cada plantilla precedida del cierre de cada contexto, sin repetir
+        seen = set()
+        for context in contexts:
+            prefix, _ = CONTEXT_BREAKOUTS[context]
+            for level, payload in self._iter_templates(payload_levels):
+                if prefix:
+                    payload = payload.with_prefix(prefix)
+                if payload.key not in seen:
+                    seen.add(payload.key)
+                    yield level, payload
+
+    def _follow_ups(self, job, reflected):
+        if job.get('probe'):
+            jobs = [job['confirm'](name, level, template)
+                    for name, contexts in reflected
+                    for level, template in self._adapted_templates(job['levels'], contexts)]
+        else:
+            jobs = [job['confirm'](name, job['level'], job['template']) for name in reflected]
+        if job.get('endpoint'):
+            for follow_up in jobs:
+                follow_up['endpoint'] = job['endpoint']
+        return jobs
+
+    def _run_jobs(self, jobs):
+        vulnerabilities = []
+        jobs = iter(jobs)
+        queue = collections.deque()
+        while True:
+            # primero las confirmaciones pendientes, luego el siguiente job
+            job = queue.popleft() if queue else next(jobs, None)
+            if job is None:
+                break
+            if self._skip(job):
+                continue
+            if job.get('batch'):
+                # las confirmaciones se prueban justo después de su petición agrupada
+                queue.extendleft(reversed(self._execute_batch_job(job)))
+            else:
+                finding = self._execute_job(job)
+                if finding:
+                    vulnerabilities.append(finding)
+            self._sleep(self._delay_for(job['url']))
+        return vulnerabilities
 
-                        vulnerable, reason = self.is_vulnerable('', response.text, marker=marker)
+    def test_url_parameter(self, url, param, payload_levels=['basic', 'styled']):
+        return self._run_jobs(self._param_job_list(url, [param], payload_levels))
 
-                        if vulnerable:
-                            self.log(f"Vulnerable: Campo '{field}' con payload nivel {level}", 'vuln')
-                            vulnerabilities.append({
-                                'type': 'form_field',
-                                'field': field,
-                                'payload': payload,
-                                'marker': marker,
-                                'reason': reason,
-                                'level': level,
-                                'method': method.upper(),
-                                'url': target_url
-                            })
-                            self.stats['vulnerabilities_found'] += 1
+    def test_url_parameters(self, url, params, payload_levels=['basic', 'styled']):
+        # en modo agrupado todos los parámetros viajan en la misma petición
+        if self.batch:
+            return self._run_jobs(self._param_job_list(url, params, payload_levels))
+        vulnerabilities = []
+        for param in params:
+            vulnerabilities.extend(self.test_url_parameter(url, param, payload_levels))
+        return vulnerabilities
 
-                            if self.verbose:
-                                self.log(f"  Payload: {payload[:80]}", 'info')
+    def test_form(self, url, form, payload_levels=['basic', 'styled']):
+        return self._run_jobs(self._form_job_list(url, form, payload_levels))
+
+    def _fetch_page(self, url):
+        request = {'method': 'GET', 'url': url, 'params': None, 'data': None}
+        entry = self.cache.page(url) if self.incremental else None
+        if entry is not None and all(self.cache.verdict(key, self._scan_levels) is not None
+                                     for key in entry['endpoints']):
+            # GET condicional solo si todas sus entradas tienen veredicto reutilizable
+            request['headers'] = ScanCache.conditional_headers(entry) or None
+
+        response = self._send(request)
+        if request.get('headers') and response.status_code == 304:
+            response.close()
+            self._count('pages_unchanged')
+            if self.verbose:
+                self.log(f"Página sin cambios (304): {url}", 'info')
+            return CachedPage(url, entry['links'], entry['endpoints'])
+
+        body = self._read_body(response)
+        with self.profiler.phase('parse'):
+            soup = bs4.BeautifulSoup(body, 'html.parser', from_encoding=response.encoding)
+        if self.cache is not None:
+            self.cache.store_page(url, response.headers, list(Crawler.links(url, soup)))
+        return soup
+
+    def _form_fingerprint(self, url, form):
+        # misma acción, método y campos => mismo formulario (p.ej. el buscador de la cabecera)
+        fields, hidden_fields = self._extract_form_fields(form)
+        method = form.get('method', 'get').lower()
+        return (method, normalize_url(urljoin(url, form.get('action', ''))),
+                frozenset(fields) | frozenset(hidden_fields))
+
+    def _form_endpoint(self, url, form):
+        method, action, fields = self._form_fingerprint(url, form)
+        return f"form {method.upper()} {action} {','.join(sorted(fields))}"
+
+    def _params_endpoint(self, url, params):
+        return f"params GET {normalize_url(url).split('?', 1)[0]} {','.join(sorted(params))}"
+
+    def _first_seen(self, seen, key):
+        """False si la entrada ya se trató en otra página del mismo rastreo."""
+        if seen is None:
+            return True
+        bucket = seen.setdefault(key.split(' ', 1)[0], set())
+        if key in bucket:
+            self._count('duplicates_skipped')
+            return False
+        bucket.add(key)
+        return True
+
+    def _endpoint_jobs(self, key, jobs):
+        with self._cache_lock:
+            self._endpoints.setdefault(key, {'findings': [], 'complete': True})
+        return self._tag_jobs(key, jobs)
 
-                        time.sleep(self.delay)
+    @staticmethod
+    def _tag_jobs(key, jobs):
+        for job in jobs:
+            job['endpoint'] = key
+            yield job
+
+    def _reuse_endpoint(self, key):
+        """Con --incremental reporta los hallazgos previos de una entrada sin
+        cambios y devuelve True; False si hay que probarla."""
+        if not self.incremental:
+            return False
+        findings = self.cache.verdict(key, self._scan_levels)
+        if findings is None:
+            return False
+        self._count('endpoints_reused')
+        if self.verbose:
+            self.log(f"Sin cambios desde el último escaneo, se reutiliza su veredicto: {key}", 'info')
+        for finding in findings:
+            finding = dict(finding, cached=True)
+            self._count('vulnerabilities_found')
+            self.report_finding(finding)
+            self._reused.append(finding)
+        return True
+
+    def _begin_scan(self, url, payload_levels):
+        self.target = url
+        self._scan_levels = tuple(payload_levels)
+        self._endpoints = {}
+        self._reused = []
+        self._sent = {}
+        self._pages = []
+        if self.headless is not None:
+            self.headless.reset()
+
+    def _end_scan(self, vulnerabilities):
+        """Barre las páginas en busca de inyecciones almacenadas (--stored),
+        guarda en la caché el veredicto de cada entrada probada por completo y
+        añade los hallazgos reutilizados."""
+        if self.stored:
+            vulnerabilities = vulnerabilities + self._sweep_stored(self._pages + self.sweep_urls)
+        if self.cache is not None:
+            for key, state in self._endpoints.items():
+                if state['complete']:
+                    self.cache.store_verdict(key, self._scan_levels, state['findings'])
+        reused, self._reused, self._endpoints = self._reused, [], {}
+        return vulnerabilities + reused
+
+    def _test_endpoint(self, url, key):
+        """Anota la entrada `key` en la página de la caché y devuelve True si
+        hay que probarla (False si se reutiliza su veredicto)."""
+        if self.cache is not None:
+            self.cache.add_endpoint(url, key)
+        return not self._reuse_endpoint(key)
+
+    def _page_job_groups(self, url, soup, payload_levels, seen=None):
+        """Genera los grupos de jobs de una página: uno por formulario, los de
+        los parámetros de la URL (uno por parámetro, o uno solo en modo
+        agrupado) y uno por cada punto de inyección adicional (cabeceras,
+        cookies, ruta, cuerpo JSON).
+
+        `seen` (dict de sets por tipo de entrada) se comparte entre páginas al
+        rastrear un sitio para no volver a probar entradas ya vistas. Con
+        --incremental las entradas que ya tienen veredicto en la caché no se
+        prueban: se reportan sus hallazgos anteriores.
+        """
+        if self.stored:
+            self._pages.append(url)
+
+        if isinstance(soup, CachedPage):
+            # 304: todas sus entradas tienen veredicto en la caché
+            for key in soup.endpoints:
+                if self._first_seen(seen, key):
+                    self._reuse_endpoint(key)
+            yield from self._extra_job_groups(url, payload_levels, seen)
+            return
+
+        # Buscar formularios
+        forms = soup.find_all('form')
+        self.log(f"Formularios encontrados: {len(forms)}", 'info')
+
+        for idx, form in enumerate(forms, 1):
+            key = self._form_endpoint(url, form)
+            if not self._first_seen(seen, key):
+                if self.verbose:
+                    self.log(f"Formulario {idx}/{len(forms)} ya probado en otra página, omitido", 'info')
+                continue
+            if not self._test_endpoint(url, key):
+                continue
 
-                    except Exception as e:
-                        if self.verbose:
-                            self.log(f"Error: {str(e)}", 'error')
+            self.log(f"\n--- Analizando formulario {idx}/{len(forms)} ---", 'info')
+            self._count('forms_tested')
+            yield self._endpoint_jobs(key, self._form_job_list(url, form, payload_levels))
 
-        return vulnerabilities
+        # Analizar parámetros URL si existen
+        parsed = urlparse(url)
+        if parsed.query:
+            params = list(parse_qs(parsed.query).keys())
+            key = self._params_endpoint(url, params)
+            if self._first_seen(seen, key) and self._test_endpoint(url, key):
+                self.log(f"\nParámetros URL detectados: {parsed.query}", 'info')
+                if self.batch:
+                    self.log(f"Probando parámetros (agrupados): {', '.join(params)}", 'info')
+                    yield self._endpoint_jobs(key, self._param_job_list(url, params, payload_levels))
+                else:
+                    # probar cada parámetro sustituyéndolo
+                    for param in params:
+                        self.log(f"Probando parámetro: {param}", 'info')
+                        yield self._endpoint_jobs(key, self._param_job_list(url, [param], payload_levels))
+
+        yield from self._extra_job_groups(url, payload_levels, seen)
+
+    def _extra_job_groups(self, url, payload_levels, seen=None):
+        # no dependen del HTML: también se prueban en páginas sin cambios (304)
+        for point in self._extra_points(url):
+            key = point.endpoint
+            if not self._first_seen(seen, key) or not self._test_endpoint(url, key):
+                continue
+            self.log(f"\nProbando {point.label}: {', '.join(point.names)}", 'info')
+            yield self._endpoint_jobs(key, self._point_job_list(point, payload_levels))
 
     def scan_url(self, url, payload_levels=['basic', 'styled', 'dangerous']):
         self.log(f"Iniciando escaneo de: {url}", 'info')
+        self._begin_scan(url, payload_levels)
         all_vulnerabilities = []
 
         try:
-            response = self.session.get(url, timeout=self.timeout)
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Buscar formularios
-            forms = soup.find_all('form')
-            self.log(f"Formularios encontrados: {len(forms)}", 'info')
-
-            for idx, form in enumerate(forms, 1):
-                self.log(f"\n--- Analizando formulario {idx}/{len(forms)} ---", 'info')
-                self.stats['forms_tested'] += 1
-                vulns = self.test_form(url, form, payload_levels)
-                all_vulnerabilities.extend(vulns)
-
-            # Analizar parámetros URL si existen
-            parsed = urlparse(url)
-            if parsed.query:
-                self.log(f"\nParámetros URL detectados: {parsed.query}", 'info')
-                # probar cada parámetro sustituyéndolo
-                qs = parse_qs(parsed.query)
-                for param in qs.keys():
-                    self.log(f"Probando parámetro: {param}", 'info')
-                    vulns = self.test_url_parameter(url, param, payload_levels)
-                    all_vulnerabilities.extend(vulns)
+            soup = self._fetch_page(url)
+
+            for jobs in self._page_job_groups(url, soup, payload_levels):
+                all_vulnerabilities.extend(self._run_jobs(jobs))
 
         except requests.exceptions.RequestException as e:
+            self.profiler.error(e)
             self.log(f"Error accediendo a la URL: {str(e)}", 'error')
         except Exception as e:
             self.log(f"Error inesperado: {str(e)}", 'error')
 
-        return all_vulnerabilities
-
-    def generate_report(self, vulnerabilities, url, output_file=None):
-        report = {
-            'scan_info': {
-                'target': url,
-                'timestamp': datetime.now().isoformat(),
-                'scanner_version': __version__,
-                'statistics': self.stats
-            },
-            'vulnerabilities': vulnerabilities
-        }
+        return self._end_scan(all_vulnerabilities)
 
-        # Reporte en consola
-        print(f"\n{'='*70}")
-        print(f"{Colors.BOLD}REPORTE DE ESCANEO{Colors.END}")
-        print(f"{'='*70}")
-        print(f"\nURL objetivo: {Colors.CYAN}{url}{Colors.END}")
-        print(f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"\n{Colors.BOLD}ESTADÍSTICAS:{Colors.END}")
-        print(f"  • Tests realizados: {self.stats['total_tested']}")
-        print(f"  • Formularios analizados: {self.stats['forms_tested']}")
-        print(f"  • Vulnerabilidades encontradas: {Colors.RED}{self.stats['vulnerabilities_found']}{Colors.END}")
+    def _pace(self, url):
+        # espera antes de una petición fuera de los jobs (rastreo, barrido)
+        self._sleep(self._delay_for(url))
 
-        if vulnerabilities:
-            print(f"\n{Colors.BOLD}VULNERABILIDADES DETECTADAS:{Colors.END}\n")
+    def _crawl_fetch(self, url):
+        self._pace(url)
+        return self._fetch_page(url)
 
-            for i, vuln in enumerate(vulnerabilities, 1):
-                print(f"{Colors.RED}[{i}]{Colors.END} Tipo: {vuln['type']}")
+    def _sweep_stored(self, pages):
+        """Barrido diferido de inyección almacenada.
 
-                if vuln['type'] == 'form_field':
-                    print(f"    Campo: {vuln['field']}")
-                    print(f"    Método: {vuln['method']}")
-                elif vuln['type'] == 'url_parameter':
-                    print(f"    Parámetro: {vuln['parameter']}")
-
-                print(f"    Nivel: {Colors.YELLOW}{vuln['level'].upper()}{Colors.END}")
-                print(f"    Payload (escaped): {html.escape(vuln['payload'][:200])}")
-                print(f"    Razón: {vuln['reason']}")
-                print(f"    URL: {vuln['url'][:200]}")
-                print()
-
-            print(f"{Colors.BOLD}RECOMENDACIONES:{Colors.END}")
-            print("""
-    1. Sanitizar TODAS las entradas del usuario
-    2. Usar HTML encoding para todas las salidas
-    3. Implementar Content Security Policy (CSP)
-    4. Validar tipos de datos en el servidor
-    5. Usar frameworks con protección anti-XSS incorporada
-    6. Implementar Web Application Firewall (WAF)
-    7. Realizar auditorías de seguridad regulares
-            """)
-        else:
-            print(f"\n{Colors.GREEN}✓ No se encontraron vulnerabilidades de HTML Injection{Colors.END}")
-
-        # Guardar a archivo si se especificó
+        Vuelve a pedir cada página de `pages` y busca en una sola pasada
+        (MarkerMatcher) todos los marcadores enviados durante el escaneo. Un
+        marcador que aparece con su payload sin escapar alrededor es una
+        inyección almacenada de la entrada que lo envió (ver SentMarker).
+        """
+        if not self._sent:
+            return []
+        pages = list(dict.fromkeys(pages))
+        self.log(f"\nBuscando inyección almacenada: {len(self._sent)} marcadores en {len(pages)} páginas", 'info')
+        matcher = MarkerMatcher(self._sent)
+        findings = []
+        found = set()
+
+        for page in pages:
+            self._pace(page)
+            try:
+                response = self._send({'method': 'GET', 'url': page, 'params': None, 'data': None})
+                raw = _as_bytes(self._read_body(response))
+            except Exception as e:
+                self._log_request_error(e)
+                continue
+            self._count('pages_swept')
+
+            with self.profiler.phase('analysis'):
+                hits = []
+                for marker, pos in matcher.finditer(raw):
+                    if marker in found:
+                        continue
+                    sent = self._sent[marker]
+                    context, window = reflection_context(raw, pos, len(marker))
+                    if sent.template.decoded(marker) in window:
+                        found.add(marker)
+                        hits.append((marker, sent, context))
+
+            for marker, sent, context in hits:
+                _, label = INPUT_TYPES[sent.type]
+                self.log(f"Vulnerable (almacenada): {label} '{sent.input}' aparece en {page}", 'vuln')
+                self._count('vulnerabilities_found')
+                finding = Finding('stored', sent.input, sent.template.decoded(marker), marker,
+                                  'Payload almacenado: reflejado sin escapar en otra petición', context,
+                                  sent.level, sent.method, sent.url, input_type=sent.type, found_at=page,
+                                  injected_at=datetime.fromtimestamp(sent.ts).isoformat())
+                self._confirm_render(finding, raw, finding['payload'], url=page)
+                if self.journal is not None:
+                    self.journal.record_finding(dict(finding, target=self.target) if self.target else finding)
+                self.report_finding(finding)
+                findings.append(finding)
+
+        self._sent = {}
+        return findings
+
+    def _crawler(self, url, crawl_options):
+        # el motor secuencial rastrea de una página en una, respetando --delay
+        return Crawler(self._crawl_fetch, url, workers=1, **crawl_options)
+
+    def scan_site(self, url, payload_levels=['basic', 'styled', 'dangerous'], **crawl_options):
+        """Rastrea el sitio desde `url` y prueba cada formulario y juego de
+        parámetros distinto una sola vez. `crawl_options` se pasan a Crawler
+        (max_depth, max_pages, include, exclude)."""
+        self.log(f"Rastreando sitio desde: {url}", 'info')
+        self._begin_scan(url, payload_levels)
+        all_vulnerabilities = []
+        seen = {}
+
+        for page_url, soup in self._crawler(url, crawl_options).crawl():
+            self._count('pages_crawled')
+            self.log(f"\n=== Página: {page_url} ===", 'info')
+            for jobs in self._page_job_groups(page_url, soup, payload_levels, seen):
+                all_vulnerabilities.extend(self._run_jobs(jobs))
+
+        return self._end_scan(all_vulnerabilities)
+
+    def scan_info(self, url, targets=None):
+        info = {
+            'target': url,
+            'timestamp': datetime.now().isoformat(),
+            'scanner_version': __version__,
+            'statistics': self.stats
+        }
+        if targets is not None:
+            info['targets'] = targets
+        return info
+
+    def open_reports(self, url, output_file=None, fmt=None, targets=None):
+        """Abre los reportes (consola y, si se pide, fichero) para que cada
+        hallazgo se vuelque en cuanto se produce."""
+        self.reporters = [ConsoleReporter()]
         if output_file:
+            self.reporters.append(make_reporter(output_file, fmt))
+        self._scan_info = self.scan_info(url, targets)
+        for reporter in list(self.reporters):
             try:
-                # Codificar payloads en JSON para evitar problemas con HTML crudo
-                safe_report = json.loads(json.dumps(report, default=str))
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(safe_report, f, indent=2, ensure_ascii=False)
-                self.log(f"Reporte guardado en: {output_file}", 'success')
+                reporter.start(self._scan_info)
+            except Exception as e:
+                self.log(f"Error abriendo reporte {reporter.path}: {str(e)}", 'error')
+                self.reporters.remove(reporter)
+
+    def report_finding(self, finding):
+        with self._report_lock:
+            for reporter in self.reporters:
+                reporter.add(finding)
+
+    def close_reports(self):
+        scan_info = dict(self._scan_info, statistics=self.stats)
+        if self.profile:
+            scan_info['profile'] = self.profiler.summary()
+        for reporter in self.reporters:
+            try:
+                reporter.close(scan_info)
+                if reporter.path:
+                    self.log(f"Reporte guardado en: {reporter.path}", 'success')
             except Exception as e:
                 self.log(f"Error guardando reporte: {str(e)}", 'error')
+        self.reporters = []
+        return scan_info
+
+    def generate_report(self, vulnerabilities, url, output_file=None, targets=None, fmt=None):
+        # reporte de una lista ya completa de hallazgos (sin streaming)
+        self.open_reports(url, output_file=output_file, fmt=fmt, targets=targets)
+        for vuln in vulnerabilities:
+            self.report_finding(vuln)
+        scan_info = self.close_reports()
+        return {'scan_info': scan_info, 'vulnerabilities': vulnerabilities}
+
+
+class TokenBucket:
+    """Token bucket por host: `rate` peticiones/segundo con ráfagas de hasta `burst`.
+
+    `reserve()` descuenta un token y devuelve cuántos segundos hay que esperar
+    antes de usarlo, así sirve tanto para hilos (time.sleep) como para asyncio.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.rate = float(rate or 0)
+
+    def reserve(self):
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class AdaptiveRate:
+    """Tasa de peticiones por host ajustada según la salud del servidor (AIMD).
+
+    Cada respuesta sana suma un paso fijo hasta `ceiling`; un error de red o una
+    respuesta que necesitó reintentos (429/5xx) la reducen a la mitad. La
+    lentitud también, pero solo tras `slow_samples` respuestas seguidas por
+    encima de `slow_factor` veces la media y de `slow_min` segundos: el jitter de
+    una respuesta suelta no cuenta. `rate` None significa sin límite: solo un
+    error fija uno (la lentitud por sí sola no) y se vuelve a quitar al
+    recuperarse.
+    """
+
+    UNLIMITED_START = 20.0
+
+    def __init__(self, rate, ceiling=None, floor=0.1, slow_factor=3.0, slow_min=0.5, slow_samples=3):
+        self.rate = rate if rate and rate > 0 else None
+        self.ceiling = ceiling if ceiling is not None else self.rate
+        self.floor = floor
+        self.slow_factor = slow_factor
+        self.slow_min = slow_min
+        self.slow_samples = slow_samples
+        self.step = (self.ceiling or self.UNLIMITED_START) / 20
+        self.latency = None
+        self.slow_streak = 0
+        self._lock = threading.Lock()
+
+    def _halve(self):
+        self.rate = max(self.floor, (self.rate or self.UNLIMITED_START) / 2)
+
+    def observe(self, latency=None, ok=True):
+        """Registra una respuesta y devuelve la nueva tasa (None = sin límite)."""
+        with self._lock:
+            if not ok:
+                self.slow_streak = 0
+                self._halve()
+                return self.rate
+            if latency is None:
+                return self.rate
+
+            if self.latency is not None and latency > self.slow_min \
+                    and latency > self.latency * self.slow_factor:
+                # la media no se mueve durante la racha: se compara siempre con
+                # la latencia sana previa
+                self.slow_streak += 1
+                if self.slow_streak < self.slow_samples:
+                    return self.rate
+                self.slow_streak = 0
+                self.latency = latency
+                if self.rate is not None:
+                    self._halve()
+                return self.rate
+
+            self.slow_streak = 0
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            if self.rate is not None:
+                self.rate += self.step
+                if self.ceiling is None and self.rate >= self.UNLIMITED_START:
+                    self.rate = None
+                elif self.ceiling is not None:
+                    self.rate = min(self.ceiling, self.rate)
+            return self.rate
+
+
+class AsyncHTMLInjectionScanner(HTMLInjectionScanner):
+    """Motor asyncio: mismas entradas y salida que HTMLInjectionScanner.scan_url,
+    pero las peticiones de payload se lanzan en paralelo.
+
+    - `concurrency`: máximo de peticiones en vuelo en todo el escaneo.
+    - `rps`: peticiones/segundo permitidas por host (token bucket). Sustituye al
+      `time.sleep(delay)` fijo; si no se indica se deriva de `delay`.
+    """
+
+    def __init__(self, concurrency=10, rps=None, **kwargs):
+        # el resto de opciones son las de HTMLInjectionScanner
+        super().__init__(**kwargs)
+        self.concurrency = max(1, int(concurrency))
+        if rps is None:
+            rps = 1.0 / self.delay if self.delay and self.delay > 0 else 0
+        self.rps = rps
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        self._executor = None
+        self._semaphore = None
+
+        # el pool de conexiones por defecto (10) se queda corto con más hilos
+        self._mount_adapter(self._make_adapter(self.concurrency))
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._buckets_lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self._rate(url).rate or 0,
+                                                           burst=min(self.concurrency, max(1, self.rps)))
+            return bucket
+
+    def _base_rate(self):
+        return self.rps
+
+    def _rate_changed(self, url, rate):
+        self._bucket(url).set_rate(rate)
+
+    async def _throttle(self, url):
+        wait = self._bucket(url).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+            self.profiler.add('throttle', wait)
+
+    async def _in_executor(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _run_job_async(self, job):
+        if self._skip(job):
+            return []
+        async with self._semaphore:
+            await self._throttle(job['url'])
+            if job.get('batch'):
+                confirmations = await self._in_executor(self._execute_batch_job, job)
+            else:
+                finding = await self._in_executor(self._execute_job, job)
+                return [finding] if finding else []
+        # las confirmaciones se lanzan fuera del semáforo de la petición agrupada
+        return await self._run_jobs_async(confirmations)
+
+    async def _run_jobs_async(self, jobs):
+        # `concurrency` tareas consumen los jobs según se generan: en memoria
+        # solo están los que hay en vuelo, no todos los del escaneo
+        jobs = iter(jobs)
+        vulnerabilities = []
+
+        async def worker():
+            for job in jobs:
+                vulnerabilities.extend(await self._run_job_async(job))
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return vulnerabilities
+
+    def _run_jobs(self, jobs):
+        return asyncio.run(self._with_executor(self._run_jobs_async(jobs)))
+
+    async def _with_executor(self, coro):
+        from concurrent.futures import ThreadPoolExecutor
+        # un executor por escaneo: los hilos no sobreviven a asyncio.run()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            return await coro
+        finally:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self._semaphore = None
+
+    async def scan_url_async(self, url, payload_levels=['basic', 'styled', 'dangerous']):
+        self.log(f"Iniciando escaneo de: {url} (concurrencia {self.concurrency}, {self.rps or '∞'} rps/host)", 'info')
+        self._begin_scan(url, payload_levels)
+        groups = []
+
+        try:
+            await self._throttle(url)
+            soup = await self._in_executor(self._fetch_page, url)
+
+            for group in self._page_job_groups(url, soup, payload_levels):
+                groups.append(group)
+
+        except requests.exceptions.RequestException as e:
+            self.profiler.error(e)
+            self.log(f"Error accediendo a la URL: {str(e)}", 'error')
+            return self._end_scan([])
+        except Exception as e:
+            self.log(f"Error inesperado: {str(e)}", 'error')
+            return self._end_scan([])
+
+        self.log(f"Lanzando las peticiones de prueba de {len(groups)} grupos de entradas", 'info')
+        return self._end_scan(await self._run_jobs_async(itertools.chain.from_iterable(groups)))
+
+    def scan_url(self, url, payload_levels=['basic', 'styled', 'dangerous']):
+        return asyncio.run(self._with_executor(self.scan_url_async(url, payload_levels)))
+
+    def _pace(self, url):
+        self._sleep(self._bucket(url).reserve())
+
+    def _crawler(self, url, crawl_options):
+        return Crawler(self._crawl_fetch, url, workers=self.concurrency, **crawl_options)
+
+    def scan_site(self, url, payload_levels=['basic', 'styled', 'dangerous'], **crawl_options):
+        self.log(f"Rastreando sitio desde: {url} (concurrencia {self.concurrency})", 'info')
+        self._begin_scan(url, payload_levels)
+        seen = {}
+        groups = []
+
+        for page_url, soup in self._crawler(url, crawl_options).crawl():
+            self._count('pages_crawled')
+            self.log(f"\n=== Página: {page_url} ===", 'info')
+            groups.extend(self._page_job_groups(page_url, soup, payload_levels, seen))
+
+        self.log(f"Lanzando las peticiones de prueba de {len(groups)} grupos de entradas", 'info')
+        return self._end_scan(self._run_jobs(itertools.chain.from_iterable(groups)))
+
+
+def make_scanner(concurrency=1, rps=None, **kwargs):
+    """Crea el motor adecuado: secuencial o asíncrono si se pide concurrencia/rps.
+    `kwargs` son las opciones de HTMLInjectionScanner, comunes a ambos."""
+    if concurrency > 1 or rps is not None:
+        return AsyncHTMLInjectionScanner(concurrency=concurrency, rps=rps, **kwargs)
+    return HTMLInjectionScanner(**kwargs)
+
+
+def normalize_target(url):
+    url = url.strip()
+    if not url.startswith(('http://', 'https://')):
+        url = 'http://' + url
+    return url
+
+
+def load_targets(path):
+    """Lee una lista de URLs (una por línea, '#' para comentarios). '-' lee de stdin."""
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+    targets = []
+    seen = set()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        url = normalize_target(line)
+        if url not in seen:
+            seen.add(url)
+            targets.append(url)
+    return targets
+
+
+# Estado por proceso del modo batch: un scanner (y una sesión HTTP) por worker
+_worker_scanner = None
+
+
+def _init_batch_worker(scanner_kwargs, no_color):
+    global _worker_scanner
+    if no_color:
+        Colors.disable()
+    _worker_scanner = make_scanner(**scanner_kwargs)
 
-        print(f"{'='*70}\n")
 
-        return report
+def _scan_batch_target(job):
+    url, payload_levels, crawl_options = job
+    before = dict(_worker_scanner.stats)
+    try:
+        if crawl_options is not None:
+            vulnerabilities = _worker_scanner.scan_site(url, payload_levels=payload_levels, **crawl_options)
+        else:
+            vulnerabilities = _worker_scanner.scan_url(url, payload_levels=payload_levels)
+    except Exception as e:
+        _worker_scanner.log(f"Error escaneando {url}: {str(e)}", 'error')
+        vulnerabilities = []
+    else:
+        if _worker_scanner.journal is not None:
+            _worker_scanner.journal.record_target(url)
+    stats = {k: v - before.get(k, 0) for k, v in _worker_scanner.stats.items()}
+    profile = _worker_scanner.profiler.take() if _worker_scanner.profile else None
+    cache = _worker_scanner.cache.take() if _worker_scanner.cache is not None else None
+    return url, vulnerabilities, stats, profile, cache
+
+
+def scan_targets(targets, payload_levels, scanner_kwargs, workers=1, no_color=False, crawl_options=None,
+                 skip=(), on_finding=None, profiler=None, cache=None):
+    """Escanea varias URLs repartiéndolas en un pool de procesos.
+
+    Devuelve (vulnerabilidades, estadísticas combinadas). Cada hallazgo lleva
+    la clave 'target' con la URL de partida que lo produjo. Las URLs de `skip`
+    (objetivos ya completados según el diario) no se vuelven a escanear.
+    `on_finding` se llama con cada hallazgo en cuanto llega su objetivo y
+    `profiler` (ScanProfiler) acumula los tiempos de todos los workers y
+    `cache` (ScanCache) recibe las páginas y veredictos que actualizó cada uno.
+    """
+    all_vulnerabilities = []
+    stats = {}
+    targets = [url for url in targets if url not in skip]
+    jobs = [(url, payload_levels, crawl_options) for url in targets]
+    if not jobs:
+        return all_vulnerabilities, stats
+
+    def merge(result):
+        url, vulnerabilities, target_stats, profile, cache_state = result
+        if profiler is not None and profile is not None:
+            profiler.merge(profile)
+        if cache is not None and cache_state is not None:
+            cache.merge(cache_state)
+        for vuln in vulnerabilities:
+            vuln['target'] = url
+            if on_finding is not None:
+                on_finding(vuln)
+        all_vulnerabilities.extend(vulnerabilities)
+        for key, value in target_stats.items():
+            stats[key] = stats.get(key, 0) + value
+
+    if workers <= 1 or len(targets) <= 1:
+        _init_batch_worker(scanner_kwargs, no_color)
+        for job in jobs:
+            merge(_scan_batch_target(job))
+    else:
+        workers = min(workers, len(targets))
+        with multiprocessing.Pool(workers, initializer=_init_batch_worker,
+                                  initargs=(scanner_kwargs, no_color)) as pool:
+            for result in pool.imap_unordered(_scan_batch_target, jobs):
+                merge(result)
+
+    return all_vulnerabilities, stats
+
+
+def serve_jobs(scanner_kwargs, payload_levels, crawl_options=None, crawl=False, no_color=False,
+               infile=None, outfile=None):
+    """Modo --serve: atiende escaneos leídos de `infile` (stdin) con un solo scanner.
+
+    Cada línea es una URL o un objeto JSON {"url": ..., "id": ..., "levels": [...],
+    "crawl": true/false}; las claves que faltan toman los valores de la línea de
+    comandos (`crawl_options` se pasan a scan_site). Por cada petición se escribe en `outfile` (stdout) una línea JSON
+    con id, url, vulnerabilidades y estadísticas de ese escaneo, o con "error"
+    si la línea no es válida. La sesión HTTP, los payloads compilados y la
+    caché de respuestas base se reutilizan entre peticiones. Termina con EOF y
+    devuelve el total de hallazgos.
+    """
+    infile = infile if infile is not None else sys.stdin
+    outfile = outfile if outfile is not None else sys.stdout
+    _init_batch_worker(scanner_kwargs, no_color)
+    crawl_options = crawl_options or {}
+    found = 0
+
+    for line in infile:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            request = json.loads(line) if line.startswith('{') else {'url': line}
+            url = normalize_target(request['url'])
+            levels = request.get('levels') or payload_levels
+            if not isinstance(levels, list):
+                raise ValueError("'levels' debe ser una lista")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            response = {'error': f"petición inválida: {e}"}
+        else:
+            job = (url, levels, crawl_options if request.get('crawl', crawl) else None)
+            url, vulnerabilities, stats, _, _ = _scan_batch_target(job)
+            if _worker_scanner.cache is not None:
+                _worker_scanner.cache.save()
+            found += len(vulnerabilities)
+            response = {'id': request.get('id'), 'url': url, 'vulnerabilities': vulnerabilities, 'stats': stats}
+        outfile.write(json.dumps(response, ensure_ascii=False, default=_json_default) + '\n')
+        outfile.flush()
+
+    return found
 
 
 def print_banner():
@@ -418,24 +3178,105 @@ def print_banner():
     print(banner)
 
 
+def close_partial_reports(scanner):
+    """Cierra los reportes de un escaneo que no terminó (Ctrl+C, error fatal)
+    para que el JSON/SARIF sea válido y scan_info lleve las estadísticas
+    parciales. Un fallo aquí no debe tapar el motivo original de la salida."""
+    if not scanner.reporters:
+        return
+    try:
+        scanner.close_reports()
+    except Exception as e:
+        print(f"{Colors.RED}Error cerrando reportes: {str(e)}{Colors.END}")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Scanner de vulnerabilidades HTML Injection',
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
 
-    parser.add_argument('-u', '--url', required=True, help='URL objetivo a escanear')
+    target_group = parser.add_mutually_exclusive_group(required=True)
+    target_group.add_argument('-u', '--url', help='URL objetivo a escanear')
+    target_group.add_argument('--targets', metavar='FILE',
+                              help="Archivo con una URL por línea ('-' para leer de stdin)")
+    target_group.add_argument('--serve', action='store_true',
+                              help='Proceso persistente: lee escaneos de stdin (URL u objeto JSON por línea) y responde una línea JSON por escaneo en stdout (requiere --yes)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                       help='Procesos para el modo --targets (default: nº de CPUs)')
     parser.add_argument('-v', '--verbose', action='store_true', help='Modo verbose (más detalles)')
     parser.add_argument('-l', '--levels', nargs='+', 
-                       choices=['basic', 'styled', 'dangerous', 'xss'],
+                       choices=['basic', 'styled', 'dangerous', 'xss', 'custom'],
                        default=['basic', 'styled', 'dangerous'],
-                       help='Niveles de payload a probar')
-    parser.add_argument('-o', '--output', help='Archivo para guardar el reporte (JSON)')
+                       help="Niveles de payload a probar ('custom' = los de --payload-file)")
+    parser.add_argument('--payload-file', action='append', metavar='FILE',
+                       help="Fichero de plantillas de payload, una por línea con {marker} (repetible, nivel 'custom')")
+    parser.add_argument('--encodings', nargs='+', choices=sorted(PAYLOAD_ENCODINGS), default=[],
+                       help='Probar también cada payload codificado: url, double-url y/o html (entidades)')
+    parser.add_argument('--inject-headers', nargs='+', metavar='NAME', default=[],
+                       help='Cabeceras a inyectar en cada página (p.ej. Referer X-Forwarded-Host)')
+    parser.add_argument('--inject-cookies', nargs='*', metavar='NAME',
+                       help='Inyectar en cookies: las indicadas o, sin nombres, todas las que fije el sitio')
+    parser.add_argument('--inject-path', action='store_true',
+                       help='Inyectar también en cada segmento de la ruta de la URL')
+    parser.add_argument('--json-body', metavar='JSON',
+                       help="Cuerpo JSON de ejemplo (o @FICHERO): se envía por POST a cada URL inyectando cada campo de texto")
+    parser.add_argument('--stored', action='store_true',
+                       help='Detectar inyección almacenada: al terminar, volver a pedir las páginas analizadas buscando todos los marcadores enviados')
+    parser.add_argument('--sweep', nargs='+', metavar='URL', default=[],
+                       help='Páginas adicionales a barrer en busca de inyección almacenada (implica --stored)')
+    parser.add_argument('-o', '--output', help='Archivo para guardar el reporte')
+    parser.add_argument('-f', '--format', choices=sorted(REPORT_FORMATS),
+                       help='Formato del reporte: json, jsonl o sarif (default: según la extensión de -o, si no json)')
     parser.add_argument('-t', '--timeout', type=int, default=15, help='Timeout en segundos (default: 15)')
-    parser.add_argument('-d', '--delay', type=float, default=0.5, help='Delay entre peticiones (default: 0.5)')
+    parser.add_argument('-d', '--delay', type=float, default=None,
+                       help='Delay entre peticiones (default: 0.5; con -c > 1 solo limita si se indica, ver --rps)')
+    parser.add_argument('-c', '--concurrency', type=int, default=1,
+                       help='Peticiones simultáneas (default: 1, motor secuencial; >1 activa el motor asíncrono)')
+    parser.add_argument('--rps', type=float,
+                       help='Límite de peticiones por segundo por host con -c > 1 (default: 1/delay si se indica -d, si no sin límite)')
+    parser.add_argument('--batch', action='store_true',
+                       help='Inyectar todos los campos/parámetros en la misma petición (un marcador por entrada) y confirmar solo los reflejados')
+    parser.add_argument('--retries', type=int, default=3,
+                       help='Reintentos por petición ante errores de red y 429/502/503/504, con backoff exponencial y Retry-After (default: 3)')
+    parser.add_argument('--auto-rate', action='store_true',
+                       help='Subir la tasa hasta 4x la de --delay/--rps mientras el servidor responda rápido (siempre se baja si se satura)')
+    parser.add_argument('--adaptive', action='store_true',
+                       help='Enviar primero una sonda inofensiva por entrada y solo los payloads adecuados al contexto donde se refleja (omite las entradas no reflejadas)')
+    parser.add_argument('--baseline-cache', type=int, default=256, metavar='N',
+                       help='Respuestas base cacheadas para el análisis diferencial (default: 256, 0 = desactivar)')
+    parser.add_argument('--stream', action='store_true',
+                       help='Leer las respuestas por bloques, parando al encontrar el marcador y saltando contenido no HTML')
+    parser.add_argument('--max-body', type=int, metavar='BYTES',
+                       help='Máximo de bytes a leer por respuesta (implica --stream, default: 2097152)')
+    parser.add_argument('--crawl', action='store_true',
+                       help='Rastrear los enlaces del mismo origen y probar todos los formularios/parámetros encontrados')
+    parser.add_argument('--depth', type=int, default=2, help='Profundidad máxima del rastreo (default: 2)')
+    parser.add_argument('--max-pages', type=int, default=100, help='Máximo de páginas a rastrear (default: 100)')
+    parser.add_argument('--include', action='append', metavar='REGEX',
+                       help='Solo rastrear URLs que cumplan esta regex (repetible)')
+    parser.add_argument('--exclude', action='append', metavar='REGEX',
+                       help='No rastrear URLs que cumplan esta regex (repetible, p.ej. logout)')
+    parser.add_argument('--journal', metavar='FILE',
+                       help='Diario JSONL con cada test completado y cada hallazgo (checkpoint del escaneo)')
+    parser.add_argument('--resume', action='store_true',
+                       help='Reanudar un escaneo interrumpido saltando los tests ya registrados en --journal')
+    parser.add_argument('--cache', metavar='FILE',
+                       help='Caché JSON entre ejecuciones: validadores HTTP, huellas de formularios/parámetros y veredictos')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Con --cache: GET condicionales y solo se prueban las entradas nuevas o cambiadas')
+    parser.add_argument('--profile', action='store_true',
+                       help='Mostrar tiempos por fase, latencias p50/p95/p99 por host y errores (también en scan_info)')
+    parser.add_argument('--profile-out', metavar='FILE',
+                       help='Volcar un perfil cProfile del hilo principal en FILE (implica --profile)')
     parser.add_argument('--no-color', action='store_true', help='Desactivar colores en la salida')
     parser.add_argument('--yes', action='store_true', help='No pedir confirmación interactiva')
-    parser.add_argument('--headless', action='store_true', help='(Placeholder) Usar navegador headless para render JS')
+    parser.add_argument('--headless', action='store_true',
+                       help='Confirmar cada hallazgo renderizándolo en Chromium headless (requiere playwright; sin él, solo detección textual)')
+    parser.add_argument('--headless-workers', type=int, default=2, metavar='N',
+                       help='Pestañas del navegador que renderizan en paralelo con --headless (default: 2)')
+    parser.add_argument('--headless-max', type=int, default=50, metavar='N',
+                       help='Máximo de hallazgos a renderizar por escaneo con --headless (default: 50)')
     parser.add_argument('--version', action='version', version=f'%(prog)s {__version__}')
 
     args = parser.parse_args()
@@ -443,40 +3284,179 @@ def main():
     if args.no_color:
         Colors.disable()
 
+    protocol_out = sys.stdout
+    if args.serve:
+        # stdout queda reservado para las respuestas JSON: banner y logs van a stderr
+        sys.stdout = sys.stderr
+
     print_banner()
 
     print(f"{Colors.RED}{Colors.BOLD}ADVERTENCIA LEGAL:{Colors.END}")
     print(f"{Colors.YELLOW}Esta herramienta solo debe usarse en aplicaciones donde tengas")
     print(f"autorización EXPLÍCITA por escrito. El uso no autorizado es ILEGAL.{Colors.END}\n")
 
+    if args.resume and not args.journal:
+        parser.error("--resume requiere --journal FILE")
+    if args.incremental and not args.cache:
+        parser.error("--incremental requiere --cache FILE")
+    if args.payload_file:
+        for path in args.payload_file:
+            if not os.path.isfile(path):
+                parser.error(f"no existe el fichero de payloads {path}")
+        if 'custom' not in args.levels:
+            args.levels.append('custom')
+
+    json_body = None
+    if args.json_body:
+        try:
+            if args.json_body.startswith('@'):
+                with open(args.json_body[1:], 'r', encoding='utf-8') as f:
+                    json_body = json.load(f)
+            else:
+                json_body = json.loads(args.json_body)
+        except (OSError, ValueError) as e:
+            parser.error(f"--json-body no es un JSON válido: {e}")
+        if not any(_json_fields(json_body)):
+            parser.error("--json-body no tiene ningún campo de texto que inyectar")
+
+    if args.serve:
+        if not args.yes:
+            parser.error("--serve lee los escaneos de stdin y requiere --yes")
+        if args.output:
+            parser.error("--serve devuelve los hallazgos por stdout y no admite -o")
+
+    targets = None
+    if args.targets:
+        if args.targets == '-' and not args.yes:
+            parser.error("--targets - lee las URLs de stdin y requiere --yes")
+        try:
+            targets = load_targets(args.targets)
+        except OSError as e:
+            parser.error(f"no se pudo leer {args.targets}: {e}")
+        if not targets:
+            parser.error("la lista de objetivos está vacía")
+
     if not args.yes:
-        confirmation = input(f"¿Tienes autorización para escanear {args.url}? (si/no): ").strip().lower()
+        scope = f"{len(targets)} objetivos de {args.targets}" if targets else args.url
+        confirmation = input(f"¿Tienes autorización para escanear {scope}? (si/no): ").strip().lower()
         if confirmation != 'si':
             print(f"\n{Colors.RED}Operación cancelada. Debes tener autorización explícita.{Colors.END}")
             sys.exit(0)
 
     print()
 
-    url = args.url
-    if not url.startswith(('http://', 'https://')):
-        url = 'http://' + url
-
-    scanner = HTMLInjectionScanner(
-        timeout=args.timeout,
-        verbose=args.verbose,
-        delay=args.delay
-    )
+    # con -c > 1 el límite por host es --rps; -d solo se traduce a 1/delay si
+    # se indica explícitamente (el 0.5 por defecto dejaría -c N en 2 peticiones/s)
+    rps = args.rps
+    if rps is None and args.concurrency > 1:
+        rps = 1.0 / args.delay if args.delay else 0
+
+    scanner_kwargs = {
+        'timeout': args.timeout,
+        'verbose': args.verbose,
+        'delay': args.delay if args.delay is not None else 0.5,
+        'concurrency': args.concurrency,
+        'rps': rps,
+        'batch': args.batch,
+        'baseline_cache': args.baseline_cache,
+        'stream': args.stream or args.max_body is not None,
+        'max_body': args.max_body or 2 * 1024 * 1024,
+        'journal': args.journal,
+        'resume': args.resume,
+        'profile': args.profile or bool(args.profile_out),
+        'adaptive': args.adaptive,
+        'retries': args.retries,
+        'auto_rate': args.auto_rate,
+        'cache': args.cache,
+        'incremental': args.incremental,
+        'payload_files': args.payload_file,
+        'encodings': args.encodings,
+        'inject_headers': args.inject_headers,
+        'inject_cookies': args.inject_cookies,
+        'inject_path': args.inject_path,
+        'json_body': json_body,
+        'stored': args.stored or bool(args.sweep),
+        'sweep_urls': [normalize_target(url) for url in args.sweep],
+        'headless': args.headless,
+        'headless_workers': args.headless_workers,
+        'headless_max': args.headless_max,
+    }
+    if args.journal and not args.resume:
+        ScanJournal.reset(args.journal)
+
+    crawl_settings = {
+        'max_depth': args.depth,
+        'max_pages': args.max_pages,
+        'include': args.include,
+        'exclude': args.exclude,
+    }
+    crawl_options = crawl_settings if args.crawl else None
+
+    if args.serve:
+        try:
+            found = serve_jobs(scanner_kwargs, args.levels, crawl_options=crawl_settings, crawl=args.crawl,
+                               no_color=args.no_color, outfile=protocol_out)
+        except KeyboardInterrupt:
+            sys.exit(130)
+        sys.exit(1 if found else 0)
+
+    scanner = make_scanner(**scanner_kwargs)
+
+    previous = []
+    if scanner.journal is not None and args.resume:
+        previous = scanner.journal.findings
+        scanner.log(f"Reanudando desde {args.journal}: {len(scanner.journal.done)} tests completados, "
+                    f"{len(previous)} hallazgos previos", 'info')
+
+    cprofile = None
+    if args.profile_out:
+        import cProfile
+        cprofile = cProfile.Profile()
+        cprofile.enable()
 
     try:
-        vulnerabilities = scanner.scan_url(url, payload_levels=args.levels)
-        scanner.generate_report(vulnerabilities, url, output_file=args.output)
-        sys.exit(1 if vulnerabilities else 0)
+        target = args.targets if targets else normalize_target(args.url)
+        scanner.open_reports(target, output_file=args.output, fmt=args.format, targets=targets)
+        for vuln in previous:
+            scanner.report_finding(vuln)
+        scanner.stats['vulnerabilities_found'] += len(previous)
+
+        if targets:
+            vulnerabilities, stats = scan_targets(targets, args.levels, scanner_kwargs,
+                                                  workers=args.workers, no_color=args.no_color,
+                                                  crawl_options=crawl_options,
+                                                  skip=scanner.journal.targets_done if args.resume else (),
+                                                  on_finding=scanner.report_finding,
+                                                  profiler=scanner.profiler,
+                                                  cache=scanner.cache)
+            for key, value in stats.items():
+                scanner.stats[key] = scanner.stats.get(key, 0) + value
+        elif crawl_options is not None:
+            vulnerabilities = scanner.scan_site(target, payload_levels=args.levels, **crawl_options)
+        else:
+            vulnerabilities = scanner.scan_url(target, payload_levels=args.levels)
+
+        if scanner.cache is not None:
+            scanner.cache.save()
+            scanner.log(f"Caché actualizada: {args.cache}", 'success')
+
+        if cprofile is not None:
+            cprofile.disable()
+            cprofile.dump_stats(args.profile_out)
+            scanner.log(f"Perfil cProfile guardado en: {args.profile_out} (python3 -m pstats {args.profile_out})", 'success')
+
+        scanner.close_reports()
+        sys.exit(1 if previous or vulnerabilities else 0)
 
     except KeyboardInterrupt:
         print(f"\n\n{Colors.YELLOW}Escaneo interrumpido por el usuario{Colors.END}")
+        close_partial_reports(scanner)
+        if args.journal:
+            print(f"{Colors.YELLOW}Progreso guardado en {args.journal}: reanuda con --journal {args.journal} --resume{Colors.END}")
         sys.exit(130)
     except Exception as e:
         print(f"\n{Colors.RED}Error fatal: {str(e)}{Colors.END}")
+        close_partial_reports(scanner)
         sys.exit(1)
 
 
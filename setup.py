@@ -30,6 +30,9 @@ setup(
         "requests>=2.31.0",
         "beautifulsoup4>=4.12.0",
     ],
+    extras_require={
+        "headless": ["playwright>=1.40.0"],
+    },
     entry_points={
         "console_scripts": [
             "html-scanner=html_scanner:main",